@@ -0,0 +1,4 @@
+"""
+Benchmarks of serene's views, mixins and serializers, kept out of the serene package.
+The harness lives in benchmarks.harness, so benchmarks.settings loads without importing Django.
+"""
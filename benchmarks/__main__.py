@@ -0,0 +1,66 @@
+"""
+Benchmarks serene views and serializers against an in-memory SQLite database.
+usage: DJANGO_SETTINGS_MODULE=benchmarks.settings python -m benchmarks [--rows=1000,100000] [--output=results.json]
+                                                                      [--compare=baseline.json]
+or ./runbenchmarks with the same options
+"""
+
+import sys
+from optparse import OptionParser
+
+from django.utils import simplejson as json
+from benchmarks.harness import ROW_COUNTS, compare, run_benchmarks
+
+
+parser = OptionParser(description='Benchmarks serene views and serializers against an in-memory SQLite database.')
+parser.add_option('--rows', dest='rows', default=','.join(map(str, ROW_COUNTS)),
+                  help='Comma separated numbers of rows to benchmark with.')
+parser.add_option('--iterations', dest='iterations', type='int', default=200,
+                  help='Number of timed runs of each benchmark.')
+parser.add_option('--warmup', dest='warmup', type='int', default=20,
+                  help='Number of untimed runs before timing each benchmark.')
+parser.add_option('--only', dest='only', default=None,
+                  help='Comma separated names of the benchmarks to run.')
+parser.add_option('--output', dest='output', default=None,
+                  help='File to write the JSON results to, instead of stdout.')
+parser.add_option('--compare', dest='compare', default=None,
+                  help='JSON results of an earlier run to compare with.')
+parser.add_option('--threshold', dest='threshold', type='float', default=0.1,
+                  help='Relative latency increase reported as a regression.')
+parser.add_option('-v', '--verbosity', dest='verbosity', type='int', default=1,
+                  help='0 to only write the results.')
+
+
+def main(argv):
+    options, args = parser.parse_args(argv)
+    try:
+        row_counts = [int(rows) for rows in options.rows.split(',')]
+    except ValueError:
+        parser.error('--rows must be a comma separated list of numbers')
+    only = options.only.split(',') if options.only else None
+
+    results = run_benchmarks(row_counts, options.iterations, options.warmup, only,
+                             log=sys.stderr.write if options.verbosity else None)
+
+    output = json.dumps(results, indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        regressions = 0
+        for name, rows, metric, before, after, regressed in compare(baseline, results, options.threshold):
+            regressions += regressed
+            sys.stderr.write('%-16s %8s %-8s %12.3f %12.3f %s\n' % (
+                name, rows, metric, before, after, 'REGRESSION' if regressed else ''))
+        if regressions:
+            sys.stderr.write('Error: %s benchmark metrics regressed\n' % regressions)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,220 @@
+"""
+Harness of the benchmarks of serene's views, mixins and serializers.
+
+Runs against an in-memory SQLite database filled with generated
+`DummyModel`/`DummyRelatedModel` rows, and reports latency, throughput
+and queries per request of each benchmark as JSON, so results of two
+commits can be compared with `compare`.
+
+Not part of the serene package: run it with ./runbenchmarks,
+which uses benchmarks.settings (the test project's plus serene.tests).
+"""
+
+import platform
+import random
+import time
+from datetime import datetime
+
+import django
+from django.db import connection, transaction
+from django.test.client import RequestFactory
+from django.utils import simplejson as json
+from serene.resources import ModelResource
+from serene.views import CreatableInstanceModelView, InstanceModelView, PaginatedListOrCreateModelView
+
+ROW_COUNTS = (1000, 100000, 1000000)
+PAGE_SIZE = 20
+
+
+def setup_database(verbosity=0):
+    """
+    Creates the in-memory database with the tables of serene's test models.
+    Returns the name of the database to restore with `teardown_database`.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.settings_dict['TEST_NAME'] = ':memory:'
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    return old_name
+
+
+def teardown_database(old_name, verbosity=0):
+    connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def populate(rows, chunk_size=10000):
+    """
+    Replaces the rows of the test models with `rows` generated dummies,
+    each with one related object, inserted in chunks of raw INSERTs
+    """
+    from serene.tests.models import DummyModel, DummyRelatedModel
+
+    cursor = connection.cursor()
+    for model in (DummyRelatedModel, DummyModel):
+        cursor.execute('DELETE FROM %s' % connection.ops.quote_name(model._meta.db_table))
+
+    now = datetime.now()
+    dummies = 'INSERT INTO %s (id, name, last_modified) VALUES (%%s, %%s, %%s)' % (
+        connection.ops.quote_name(DummyModel._meta.db_table))
+    related = 'INSERT INTO %s (id, name, dummy_id, last_modified) VALUES (%%s, %%s, %%s, %%s)' % (
+        connection.ops.quote_name(DummyRelatedModel._meta.db_table))
+    for start in range(1, rows + 1, chunk_size):
+        ids = range(start, min(start + chunk_size, rows + 1))
+        cursor.executemany(dummies, [(id, 'dummy%s' % id, now) for id in ids])
+        cursor.executemany(related, [(id, 'related%s' % id, id, now) for id in ids])
+    transaction.commit_unless_managed()
+
+
+def get_benchmarks(rows):
+    """
+    Returns the (name, run) benchmarks for a database of `rows` dummies,
+    where run() makes one request or serialization
+    """
+    from serene.tests.models import DummyModel, DummyRelatedModel
+
+    class DummyResource(ModelResource):
+        model = DummyModel
+
+        def url(self, instance):
+            return '/dummies/%s' % instance.id
+
+    class RelatedResource(ModelResource):
+        model = DummyRelatedModel
+
+        def url(self, instance):
+            return '/related/%s' % instance.id
+
+    factory = RequestFactory()
+    instance_view = InstanceModelView.as_view(resource=DummyResource)
+    partial_update_view = InstanceModelView.as_view(resource=DummyResource, partial_update=True)
+    upsert_view = CreatableInstanceModelView.as_view(resource=DummyResource)
+    list_view = PaginatedListOrCreateModelView.as_view(resource=RelatedResource, limit=PAGE_SIZE)
+    last_page = max(1, (rows + PAGE_SIZE - 1) // PAGE_SIZE)
+    page = list(DummyRelatedModel.objects.select_related('dummy').order_by('id')[:PAGE_SIZE])
+
+    def random_id():
+        return random.randint(1, rows)
+
+    def get(view, id):
+        return view(factory.get('/dummies/%s' % id), id)
+
+    def put(view, id):
+        body = json.dumps({'name': 'updated%s' % id})
+        return view(factory.put('/dummies/%s' % id, body, content_type='application/json'), id)
+
+    return [
+        ('instance_get', lambda: get(instance_view, random_id())),
+        ('list_first_page', lambda: list_view(factory.get('/related'))),
+        ('list_deep_page', lambda: list_view(factory.get('/related', {'page': last_page}))),
+        ('create', lambda: list_view(factory.post('/related', json.dumps({'name': 'created', 'dummy': 1}),
+                                                  content_type='application/json'))),
+        ('update', lambda: put(instance_view, random_id())),
+        ('partial_update', lambda: put(partial_update_view, random_id())),
+        ('upsert', lambda: put(upsert_view, random_id())),
+        ('serialize_page', lambda: RelatedResource().filter_response(page)),
+    ]
+
+
+def count_queries(run):
+    """
+    Returns the number of queries `run` makes
+    """
+    use_debug_cursor = connection.use_debug_cursor
+    connection.use_debug_cursor = True
+    start = len(connection.queries)
+    try:
+        run()
+        return len(connection.queries) - start
+    finally:
+        connection.use_debug_cursor = use_debug_cursor
+
+
+def summarize(latencies, total):
+    """
+    Summarizes the per run `latencies` of a benchmark that took `total` seconds
+    """
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        'iterations': len(latencies),
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'throughput': len(latencies) / total if total else None,
+    }
+
+
+def measure(run, iterations, warmup):
+    for i in range(warmup):
+        run()
+
+    latencies = []
+    start = time.time()
+    for i in range(iterations):
+        begin = time.time()
+        run()
+        latencies.append(time.time() - begin)
+    result = summarize(latencies, time.time() - start)
+    result['queries'] = count_queries(run)
+    return result
+
+
+def run_benchmarks(row_counts=ROW_COUNTS, iterations=200, warmup=20, only=None, seed=0, log=None):
+    """
+    Runs every benchmark (or the `only` ones) against each of `row_counts`
+    and returns the results as a JSON serializable dict
+    """
+    random.seed(seed)
+    results = []
+    old_name = setup_database()
+    try:
+        for rows in row_counts:
+            if log:
+                log('populating %s rows\n' % rows)
+            populate(rows)
+            for name, run in get_benchmarks(rows):
+                if only and name not in only:
+                    continue
+                result = measure(run, iterations, warmup)
+                result.update({'name': name, 'rows': rows})
+                results.append(result)
+                if log:
+                    log('%(name)s rows=%(rows)s mean=%(mean_ms).3fms p95=%(p95_ms).3fms queries=%(queries)s\n' % result)
+    finally:
+        teardown_database(old_name)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'date': datetime.now().isoformat(),
+            'iterations': iterations,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compares two sets of results and returns the (name, rows, metric, before, after, regressed) rows
+    for the benchmarks they have in common. A benchmark regressed if its mean or p95 latency
+    grew by more than `threshold`, or it makes more queries.
+    """
+    before = dict(((result['name'], result['rows']), result) for result in baseline['results'])
+    comparison = []
+    for result in current['results']:
+        previous = before.get((result['name'], result['rows']))
+        if previous is None:
+            continue
+        for metric in ('mean_ms', 'p95_ms', 'queries'):
+            old, new = previous[metric], result[metric]
+            if metric == 'queries':
+                regressed = new > old
+            else:
+                regressed = old > 0 and (new - old) / old > threshold
+            comparison.append((result['name'], result['rows'], metric, old, new, regressed))
+    return comparison
@@ -0,0 +1,6 @@
+# the test project's settings, with serene's test models installed
+from __future__ import absolute_import
+
+from settings import *
+
+INSTALLED_APPS = tuple(INSTALLED_APPS) + ('serene.tests',)
@@ -0,0 +1,25 @@
+from django.utils.unittest.case import TestCase
+from benchmarks.harness import compare, summarize
+
+
+class TestBenchmarks(TestCase):
+
+    def test_summarize_must_report_latencies_in_ms(self):
+        summary = summarize([0.001] * 90 + [0.01] * 10, 0.19)
+        self.assertEqual(summary['iterations'], 100)
+        self.assertAlmostEqual(summary['mean_ms'], 1.9)
+        self.assertAlmostEqual(summary['p50_ms'], 1)
+        self.assertAlmostEqual(summary['p95_ms'], 10)
+        self.assertAlmostEqual(summary['throughput'], 100 / 0.19)
+
+    def test_compare_must_flag_regressions(self):
+        baseline = {'results': [{'name': 'get', 'rows': 10, 'mean_ms': 1.0, 'p95_ms': 2.0, 'queries': 1}]}
+        current = {'results': [
+            {'name': 'get', 'rows': 10, 'mean_ms': 1.05, 'p95_ms': 3.0, 'queries': 2},
+            {'name': 'new', 'rows': 10, 'mean_ms': 1.0, 'p95_ms': 1.0, 'queries': 1},
+        ]}
+        self.assertEqual(compare(baseline, current, threshold=0.1), [
+            ('get', 10, 'mean_ms', 1.0, 1.05, False),
+            ('get', 10, 'p95_ms', 2.0, 3.0, True),
+            ('get', 10, 'queries', 1, 2, True),
+        ])
@@ -0,0 +1,94 @@
+import hashlib
+import time
+
+from django.core.cache import cache as default_cache, get_cache
+from django.db.models.signals import post_delete, post_save
+
+
+class Versions(object):
+    """
+    Version numbers kept in a cache and bumped whenever an instance of their model is saved or deleted,
+    for keys of data derived from the model to change as soon as the model does.
+    With `per_instance` each instance has a version of its own, otherwise the whole model shares one.
+    Versions start from the clock, so data cached under an expired version is never reused.
+    """
+    def __init__(self, cache, prefix, per_instance=False):
+        self.cache = cache
+        self.prefix = prefix
+        self.per_instance = per_instance
+        # connected for every model up front: a process has to bump the versions of models
+        # it never reads, for the other processes sharing the cache to see its changes
+        dispatch_uid = 'serene.cache.Versions.%s' % id(self)
+        post_save.connect(self.bump, weak=False, dispatch_uid=dispatch_uid)
+        post_delete.connect(self.bump, weak=False, dispatch_uid=dispatch_uid)
+
+    def key(self, model, pk=None):
+        if self.per_instance:
+            return '%s:%s:%s:version' % (self.prefix, model._meta, pk)
+        return '%s:%s:version' % (self.prefix, model._meta)
+
+    def get(self, model, pk=None):
+        """
+        Returns the current version of the model, or of its instance `pk` with `per_instance`
+        """
+        key = self.key(model, pk)
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, int(time.time() * 1000))
+            version = self.cache.get(key)
+        return version
+
+    def bump(self, sender, instance, **kwargs):
+        key = self.key(sender, instance.pk)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # never read, the first get starts from the clock anyway
+            pass
+
+
+class ResponseCache(object):
+    """
+    Keeps rendered instance representations in Django's cache framework for `timeout` seconds,
+    keyed by resource, primary key, `last_modified` and media type.
+    Representations of an instance are dropped as soon as it is saved or deleted.
+    `hits` and `misses` count the lookups made in this process.
+    """
+    def __init__(self, timeout=300, cache_alias=None):
+        self.timeout = timeout
+        self.cache = get_cache(cache_alias) if cache_alias else default_cache
+        self.versions = Versions(self.cache, 'serene:response', per_instance=True)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, resource, pk, last_modified, media_type, params=()):
+        """
+        Returns the cache key of a representation.
+        `params` are the query parameters that could change it.
+        """
+        model = resource.model
+        variant = repr((resource.__module__, resource.__name__, pk, self.versions.get(model, pk),
+                        str(last_modified), media_type, sorted(params)))
+        return 'serene:response:%s:%s' % (model._meta, hashlib.md5(variant).hexdigest())
+
+    def get(self, key):
+        """
+        Returns the (content, media_type) cached under `key`, or None
+        """
+        cached = self.cache.get(key)
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cached
+
+    def set(self, key, content, media_type):
+        self.cache.set(key, (content, media_type), self.timeout)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'ratio': float(self.hits) / lookups if lookups else None,
+        }
@@ -0,0 +1,41 @@
+"""
+Compatibility across the django versions serene runs on
+"""
+
+try:
+    from django.http import StreamingHttpResponse
+except ImportError:
+    # before django 1.5 a plain HttpResponse streams iterator content
+    from django.http import HttpResponse as StreamingHttpResponse
+
+try:
+    from django.db.transaction import atomic
+except ImportError:
+    # before django 1.6 commit_on_success is the closest thing, nested calls included
+    from django.db.transaction import commit_on_success as atomic
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def is_streaming(response):
+    """
+    Tells whether the response content is an iterator, sent as it is consumed
+    """
+    # before django 1.5 any HttpResponse made from an iterator streams it
+    return getattr(response, 'streaming', False) or not getattr(response, '_is_string', True)
+
+
+def get_streaming_content(response):
+    if getattr(response, 'streaming', False):
+        return response.streaming_content
+    return response._container
+
+
+def set_streaming_content(response, content):
+    if getattr(response, 'streaming', False):
+        response.streaming_content = content
+    else:
+        response._container = content
@@ -0,0 +1,59 @@
+import re
+import zlib
+from itertools import chain
+
+from django.utils.encoding import smart_str
+
+# zlib writes gzip headers and trailers for window bits above 16
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+ACCEPT_ENCODING_RE = re.compile(r'^\s*([^\s;]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+def accepts_gzip(request):
+    """
+    Tells whether the Accept-Encoding header of the request allows gzip
+    """
+    accepted = {}
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        match = ACCEPT_ENCODING_RE.match(coding)
+        if match:
+            try:
+                quality = float(match.group(2)) if match.group(2) else 1.0
+            except ValueError:
+                quality = 0.0
+            accepted[match.group(1).lower()] = quality
+    return accepted.get('gzip', accepted.get('x-gzip', accepted.get('*', 0.0))) > 0
+
+
+def compress_string(content, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(content) + compressor.flush()
+
+
+def compress_sequence(chunks, level=6):
+    """
+    Compresses an iterable of strings into a gzip stream,
+    flushing after every chunk so each goes out as soon as it's made
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(smart_str(chunk)) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def peek(chunks, length):
+    """
+    Reads chunks until they add up to `length` bytes or the iterable is exhausted.
+    Returns whether they reached `length`, and an iterable of every chunk, the ones read included.
+    """
+    iterator = iter(chunks)
+    head, size = [], 0
+    for chunk in iterator:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= length:
+            return True, chain(head, iterator)
+    return False, head
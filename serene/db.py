@@ -0,0 +1,146 @@
+"""
+Database helpers for the writes serene's mixins make
+"""
+
+from django.db import connections, transaction, IntegrityError
+from django.db.models import AutoField
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.signals import post_save
+from serene.compat import atomic
+
+
+def send_post_save(queryset, instance, created=False):
+    """
+    Sends the post_save Django leaves out for rows written by queryset updates or raw SQL,
+    so receivers (cached counts and responses, ...) see those writes too
+    """
+    post_save.send(sender=queryset.model, instance=instance, created=created, raw=False, using=queryset.db)
+
+
+def upsert(queryset, lookup, values, instance):
+    """
+    Updates the row of `queryset` matching `lookup` with `values`,
+    or inserts `instance` if there is no such row, without racing concurrent writers.
+    Returns an (instance, created) tuple.
+
+    On PostgreSQL, when `lookup` is a single unique field, this is one
+    INSERT ... ON CONFLICT DO UPDATE statement. Elsewhere the row is updated,
+    and inserted only if there was nothing to update, in a transaction.
+    Either way post_save is sent for the written row.
+    """
+    connection = connections[queryset.db]
+    target = conflict_target(queryset.model, lookup)
+    if target is not None and supports_on_conflict(connection):
+        return insert_on_conflict(queryset, target, values, instance)
+    return update_or_insert(queryset, lookup, values, instance)
+
+
+def conflict_target(model, lookup):
+    """
+    Returns the unique field `lookup` is made of, or None if there isn't exactly one
+    """
+    if len(lookup) != 1:
+        return None
+    name = lookup.keys()[0]
+    if name == 'pk':
+        return model._meta.pk
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.primary_key or field.unique else None
+
+
+def supports_on_conflict(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    version = getattr(connection, 'pg_version', None)
+    if version is None:
+        connection.cursor()
+        major, minor = connection.ops.postgres_version[:2]
+        version = major * 10000 + minor * 100
+    return version >= 90500
+
+
+def insert_on_conflict(queryset, target, values, instance):
+    """
+    Inserts `instance`, or updates the columns named in `values` from it
+    if `target` conflicts, and reads the row back in the same statement.
+    Only the queryset's model table is written, so filtered querysets aren't honoured here.
+    """
+    model = queryset.model
+    opts = model._meta
+    using = queryset.db
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    fields = [field for field in opts.fields
+              if not (isinstance(field, AutoField) and getattr(instance, field.attname) is None)]
+    params = [field.get_db_prep_save(field.pre_save(instance, True), connection=connection)
+              for field in fields]
+    updates = [opts.get_field(name).column for name in values]
+
+    sql = 'INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (%s) DO %s RETURNING %s, (xmax = 0)' % (
+        qn(opts.db_table),
+        ', '.join(qn(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        qn(target.column),
+        'UPDATE SET %s' % ', '.join('%s = EXCLUDED.%s' % (qn(column), qn(column)) for column in updates)
+            if updates else 'NOTHING',
+        ', '.join('%s.%s' % (qn(opts.db_table), qn(field.column)) for field in opts.fields),
+    )
+
+    with atomic(using=using):
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    if row is None:
+        # DO NOTHING doesn't return the row it left alone
+        return queryset.get(**{target.name: getattr(instance, target.attname)}), False
+
+    instance = model(*row[:-1])
+    instance._state.adding = False
+    instance._state.db = using
+    send_post_save(queryset, instance, row[-1])
+    return instance, row[-1]
+
+
+def update_or_insert(queryset, lookup, values, instance):
+    """
+    Updates the matching row, or inserts `instance` if there was none.
+    The insert runs in a savepoint: when a concurrent request inserted the row first,
+    the unique constraint fails it and the row is updated instead.
+    """
+    using = queryset.db
+    with atomic(using=using):
+        if not queryset.filter(**lookup).update(**values):
+            sid = transaction.savepoint(using=using)
+            try:
+                instance.save(force_insert=True, using=using)
+            except IntegrityError:
+                transaction.savepoint_rollback(sid, using=using)
+                if not queryset.filter(**lookup).update(**values):
+                    raise
+            else:
+                transaction.savepoint_commit(sid, using=using)
+                return instance, True
+    instance = queryset.get(**lookup)
+    send_post_save(queryset, instance)
+    return instance, False
+
+
+def has_index(model, name):
+    """
+    Tells whether lookups on the field `name` of `model` can use an index,
+    either its own or a multi-column one it leads
+    """
+    opts = model._meta
+    field = opts.get_field(name)
+    if field.primary_key or field.unique or field.db_index:
+        return True
+    indexes = list(opts.unique_together) + list(getattr(opts, 'index_together', ()))
+    if indexes and isinstance(indexes[0], basestring):
+        indexes = [indexes]
+    return any(fields and fields[0] == name for fields in indexes)
+
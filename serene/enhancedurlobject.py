@@ -1,17 +1,41 @@
-from urlobject import URLObject
+from urlobject import URLObject, ensure_unicode
 
 
 class EnhancedURLObject(URLObject):
 
     def del_query_param(self, key):
-        new_query = [(k, v) for k, v in self.query_list() if k != key]
+        return self.del_query_params([key])
+
+    def del_query_params(self, keys):
+        keys = set(keys)
+        new_query = [(k, v) for k, v in self.query_list() if k not in keys]
         return self.with_query(new_query)
 
     def __sub__(self, query_param):
         if hasattr(query_param, '__iter__'):
-            new = self
-            for qp in query_param:
-                new = new.del_query_param(qp)
-            return new
+            return self.del_query_params(query_param)
         else:
-            return self.del_query_param(query_param)
\ No newline at end of file
+            return self.del_query_param(query_param)
+
+
+class LinkBuilder(object):
+    """
+    Builds variants of a URL with some of its query parameters replaced,
+    parsing the URL and its query only once however many links are built
+    """
+    def __init__(self, uri):
+        self.uri = uri
+        url = EnhancedURLObject.parse(uri)
+        self.components = url.components()
+        del self.components['query']
+        self.query = url.query_list()
+
+    def build(self, params=(), remove=()):
+        """
+        Returns the URL with the (key, value) `params` set, in order, at the end of the query,
+        and the `remove` keys taken out
+        """
+        keys = set(remove) | set(key for key, value in params)
+        query = [(k, v) for k, v in self.query if k not in keys]
+        query.extend((key, ensure_unicode(value)) for key, value in params)
+        return EnhancedURLObject(query=query, **self.components)
@@ -0,0 +1,84 @@
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+class Timings(object):
+    """
+    Collects how long each phase of a request took, and the queries it made.
+    Phases may nest: each one is charged only for the time spent outside
+    of the phases nested in it, and the time spent running queries is charged to `db`.
+    Queries are read from the connections' debug cursors while timing.
+    """
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self._stack = []
+        self._debug_cursors = None
+
+    def start(self):
+        self._debug_cursors = [(connection, connection.use_debug_cursor) for connection in connections.all()]
+        for connection, use_debug_cursor in self._debug_cursors:
+            connection.use_debug_cursor = True
+
+    def stop(self):
+        for connection, use_debug_cursor in self._debug_cursors or ():
+            connection.use_debug_cursor = use_debug_cursor
+        self._debug_cursors = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        marks = [len(connection.queries) for connection in connections.all()]
+        # time, db time and queries of the nested phases
+        self._stack.append([0.0, 0.0, 0])
+        try:
+            yield
+        finally:
+            nested_elapsed, nested_db, nested_queries = self._stack.pop()
+            elapsed = time.time() - start
+
+            db, queries = 0.0, 0
+            for connection, mark in zip(connections.all(), marks):
+                for query in connection.queries[mark:]:
+                    db += float(query['time'])
+                    queries += 1
+
+            self.add(name, elapsed - nested_elapsed - (db - nested_db))
+            self.add('db', db - nested_db)
+            self.queries += queries - nested_queries
+            if self._stack:
+                parent = self._stack[-1]
+                parent[0] += elapsed
+                parent[1] += db
+                parent[2] += queries
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + max(duration, 0.0)
+
+    @property
+    def total(self):
+        return sum(self.durations.values())
+
+    def as_dict(self):
+        """
+        Returns the durations in milliseconds along with the query count, e.g. for a metrics pipeline
+        """
+        metrics = dict((name, duration * 1000) for name, duration in self.durations.items())
+        metrics['total'] = self.total * 1000
+        metrics['queries'] = self.queries
+        return metrics
+
+    def server_timing(self):
+        """
+        Returns the value of a Server-Timing header listing every phase
+        """
+        metrics = []
+        for name, duration in sorted(self.durations.items()):
+            metric = '%s;dur=%.3f' % (name, duration * 1000)
+            if name == 'db':
+                metric += ';desc="%s queries"' % self.queries
+            metrics.append(metric)
+        metrics.append('total;dur=%.3f' % (self.total * 1000))
+        return ', '.join(metrics)
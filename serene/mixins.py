@@ -1,26 +1,465 @@
+import hashlib
+import random
+import time
+from itertools import islice
+
+from django.core.serializers.json import DateTimeAwareJSONEncoder
+from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import get_script_prefix, set_script_prefix
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, Max
+from django.db.models.signals import post_save
+from django.http import HttpResponse
+from django.db.models.query import QuerySet
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.csrf import csrf_exempt
 from djangorestframework import status
 from djangorestframework.mixins import (
     ModelMixin as DrfModelMixin,
     ReadModelMixin as DrfReadModelMixin,
     CreateModelMixin as DrfCreateModelMixin,
+    ListModelMixin as DrfListModelMixin,
     PaginatorMixin as DrfPaginatorMixin,
 )
+from djangorestframework.renderers import BaseRenderer
 from djangorestframework.response import ErrorResponse, Response
-from enhancedurlobject import EnhancedURLObject
+from djangorestframework.utils.mediatypes import get_media_type_params
+from enhancedurlobject import LinkBuilder
+from serene.paginator import Paginator
+from serene.compat import StreamingHttpResponse, atomic, get_streaming_content, is_streaming, set_streaming_content
+from serene.compression import accepts_gzip, compress_sequence, compress_string, peek
+from serene.db import send_post_save, upsert
+from serene.instrumentation import Timings
+from serene.signals import request_timed
+from serene.models import Tombstone
+from serene.resources import unique
+from serene.utils import (convert_position, decode_cursor, encode_cursor, now, parse_datetime_header, parse_row_etags,
+    reverse_ordering, row_etag, seek_query, unmodified_since_lookup, was_modified_since)
+
+
+# requests that can be served from a read replica
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class TimingMixin(object):
+    """
+    Times the phases of serving a request (db, serialize, links, render)
+    when `timing` is set, and reports them in a Server-Timing header
+    and through `report_timings`
+    """
+
+    timing = False
+    """
+    Time requests, counting queries with the connections' debug cursors
+    """
+
+    timings = None
+
+    # like djangorestframework's, as views take their csrf exemption from dispatch
+    @csrf_exempt
+    def dispatch(self, request, *args, **kwargs):
+        if not self.timing:
+            return super(TimingMixin, self).dispatch(request, *args, **kwargs)
+
+        self.timings = Timings()
+        self.timings.start()
+        try:
+            with self.timings.phase('view'):
+                response = super(TimingMixin, self).dispatch(request, *args, **kwargs)
+        finally:
+            self.timings.stop()
+        response['Server-Timing'] = self.timings.server_timing()
+        self.report_timings(request, response, self.timings)
+        return response
+
+    def report_timings(self, request, response, timings):
+        """
+        Hands the timings of a request over to the metrics pipeline,
+        by default by sending the `serene.signals.request_timed` signal
+        """
+        request_timed.send(sender=type(self), request=request, response=response, timings=timings)
+
+    def filter_response(self, obj):
+        if self.timings is None:
+            return super(TimingMixin, self).filter_response(obj)
+        with self.timings.phase('serialize'):
+            return super(TimingMixin, self).filter_response(obj)
+
+    def serialize_page_info(self, page):
+        if self.timings is None:
+            return super(TimingMixin, self).serialize_page_info(page)
+        with self.timings.phase('links'):
+            return super(TimingMixin, self).serialize_page_info(page)
+
+    def render(self, response):
+        if self.timings is None:
+            return super(TimingMixin, self).render(response)
+        with self.timings.phase('render'):
+            return super(TimingMixin, self).render(response)
+
+
+class CompressionMixin(object):
+    """
+    Gzips responses of at least `compress_min_length` bytes when `compress` is set
+    and the client accepts it, streamed responses included
+    """
+
+    compress = False
+    """
+    Compress responses negotiated through Accept-Encoding
+    """
+
+    compress_level = 6
+    """
+    zlib compression level, from 1 (fastest) to 9 (smallest)
+    """
+
+    compress_min_length = 1024
+    """
+    Smaller responses aren't worth compressing
+    """
+
+    def render(self, response):
+        resp = super(CompressionMixin, self).render(response)
+        if self.compress and resp.status_code == status.HTTP_200_OK and not resp.has_header('Content-Encoding'):
+            patch_vary_headers(resp, ('Accept-Encoding',))
+            if accepts_gzip(self.request):
+                self.compress_response(resp)
+        return resp
+
+    def compress_response(self, resp):
+        if is_streaming(resp):
+            # look ahead just far enough to tell whether the stream is long enough
+            long_enough, chunks = peek(get_streaming_content(resp), self.compress_min_length)
+            if not long_enough:
+                set_streaming_content(resp, chunks)
+                return
+            set_streaming_content(resp, compress_sequence(chunks, self.compress_level))
+            if resp.has_header('Content-Length'):
+                del resp['Content-Length']
+        else:
+            if len(resp.content) < self.compress_min_length:
+                return
+            resp.content = compress_string(resp.content, self.compress_level)
+            if resp.has_header('Content-Length'):
+                resp['Content-Length'] = str(len(resp.content))
+
+        resp['Content-Encoding'] = 'gzip'
+        # the compressed body is no longer byte for byte what a strong etag vouches for
+        if resp.has_header('ETag') and not resp['ETag'].startswith('W/'):
+            resp['ETag'] = 'W/' + resp['ETag']
+
+
+class LinkMixin(object):
+    """
+    Builds links to variants of the request URL
+    """
+
+    _link_builder = None
+    _link_builder_request = None
+
+    def get_link_builder(self):
+        """
+        Returns the builder of this request's links,
+        parsing the request URL the first time it's needed
+        """
+        if self._link_builder is None or self._link_builder_request is not self.request:
+            self._link_builder = LinkBuilder(self.request.build_absolute_uri())
+            self._link_builder_request = self.request
+        return self._link_builder
+
+
+class ModelMixin(DrfModelMixin):
+    """
+    Reads instances through `get_queryset`,
+    letting the resource tune the queryset (select_related, ...),
+    from a read replica for safe requests and from the primary database otherwise
+    """
+
+    read_databases = None
+    """
+    Aliases of the replicas to read from, SERENE_READ_DATABASES by default
+    """
+
+    write_database = DEFAULT_DB_ALIAS
+    """
+    Alias of the primary database, written to and read from after writes
+    """
+
+    sticky_window = 5
+    """
+    Seconds a client keeps reading from the primary after one of its writes,
+    so it doesn't miss its own writes on a lagging replica
+    """
+
+    sticky_cookie = 'serene_primary_until'
+    """
+    Cookie holding the time until which a client reads from the primary.
+    Clients that don't keep cookies may send it back in the `sticky_header` header instead.
+    """
+
+    sticky_header = 'X-Serene-Primary-Until'
+
+    _database = None
+
+    def get_queryset(self):
+        queryset = super(ModelMixin, self).get_queryset().using(self.get_database())
+        if hasattr(self.resource, 'prepare_queryset'):
+            queryset = self.resource(self).prepare_queryset(queryset)
+        return queryset
+
+    def get_database(self):
+        """
+        Returns the alias of the database to query for the current request,
+        chosen once so all of its queries see the same replica
+        """
+        request = getattr(self, 'request', None)
+        if self._database is None or self._database[0] is not request:
+            self._database = (request, self.choose_database(request))
+        return self._database[1]
+
+    def choose_database(self, request):
+        """
+        Picks the primary, or a random replica for safe requests of clients that didn't just write
+        """
+        read_databases = self.get_read_databases()
+        if request is None or not read_databases or request.method not in SAFE_METHODS or self.is_sticky(request):
+            return self.write_database
+        return random.choice(read_databases)
+
+    def get_read_databases(self):
+        if self.read_databases is None:
+            return getattr(settings, 'SERENE_READ_DATABASES', ())
+        return self.read_databases
 
+    def is_sticky(self, request):
+        """
+        Tells whether the client wrote recently enough to read from the primary
+        """
+        header = 'HTTP_' + self.sticky_header.upper().replace('-', '_')
+        until = request.COOKIES.get(self.sticky_cookie) or request.META.get(header)
+        try:
+            return float(until) > time.time()
+        except (TypeError, ValueError):
+            return False
+
+    def render(self, response):
+        resp = super(ModelMixin, self).render(response)
+        request = self.request
+        if (self.sticky_window and self.get_read_databases() and
+                request.method not in SAFE_METHODS and resp.status_code < 400):
+            until = '%.3f' % (time.time() + self.sticky_window)
+            resp.set_cookie(self.sticky_cookie, until, max_age=self.sticky_window)
+            resp[self.sticky_header] = until
+        return resp
+
+    def get_object(self, *args, **kwargs):
+        return self.get_queryset().get(self.build_query(*args, **kwargs))
 
-class ReadModelMixin(DrfReadModelMixin):
+    def get_preconditions(self, request):
+        """
+        Turns the If-Match or If-Unmodified-Since header of a request into lookups on `last_modified`
+        the row must still match to be written. Returns None if the request has no precondition.
+        """
+        if 'last_modified' not in [field.name for field in self.resource.model._meta.fields]:
+            return None
+
+        if_match = request.META.get('HTTP_IF_MATCH')
+        if if_match:
+            if if_match.strip() == '*':
+                return {}
+            values = parse_row_etags(if_match)
+            if not values:
+                raise ErrorResponse(status.HTTP_412_PRECONDITION_FAILED)
+            return {'last_modified__in': values}
+
+        if_unmodified_since = request.META.get('HTTP_IF_UNMODIFIED_SINCE')
+        if if_unmodified_since:
+            return unmodified_since_lookup(if_unmodified_since)
+        return None
+
+    def update_if(self, lookup, values, preconditions, missing=status.HTTP_404_NOT_FOUND):
+        """
+        Writes `values` to the row matching `lookup` with a single UPDATE,
+        that also has to match `preconditions` if there are any.
+        Raises 412 if the row exists but doesn't match, and `missing` if it doesn't exist.
+        """
+        queryset = self.get_queryset().filter(**lookup)
+        if queryset.filter(**(preconditions or {})).update(**values):
+            return
+        if preconditions is not None and missing != status.HTTP_412_PRECONDITION_FAILED and queryset.exists():
+            raise ErrorResponse(status.HTTP_412_PRECONDITION_FAILED)
+        raise ErrorResponse(missing)
+
+    def get_update_values(self, lookup, sent=None):
+        """
+        Splits the validated content, restricted to the `sent` keys if given,
+        into the column values to write, with `last_modified` bumped,
+        and the many to many values to set on the instance once it is written
+        """
+        model = self.resource.model
+        pk = lookup.get('pk', lookup.get(model._meta.pk.name))
+        if pk is not None:
+            # lets the form's unique checks leave out the instance being updated
+            self.model_instance = model(pk=pk)
+
+        content = self.CONTENT
+        if sent is not None:
+            content = dict((key, val) for (key, val) in content.items() if key in sent)
+        columns = set(field.name for field in model._meta.fields if not field.primary_key)
+        many_to_many = set(field.name for field in model._meta.many_to_many)
+
+        values = dict((key, val) for (key, val) in content.items() if key in columns)
+        if 'last_modified' in columns:
+            values['last_modified'] = now()
+        related = dict((key, val) for (key, val) in content.items() if key in many_to_many)
+        return values, related
+
+    def get_lookup(self, *args, **kwargs):
+        """
+        Returns the URL arguments identifying an instance as a dict of field lookups,
+        the same ones `build_query` wraps in a Q object
+        """
+        lookup = dict(kwargs)
+        lookup.pop(BaseRenderer._FORMAT_QUERY_PARAM, None)
+        if args:
+            lookup['pk'] = args[-1]
+        return lookup
+
+
+class ReadModelMixin(ModelMixin, DrfReadModelMixin):
+
+    response_cache = None
+    """
+    A serene.cache.ResponseCache to serve rendered representations from,
+    instead of fetching and serializing the instance on every GET
+    """
+
+    single_flight = None
+    """
+    A serene.singleflight.SingleFlight through which concurrent GETs of the same representation
+    share one query and serialization. The representation mustn't depend on who asks for it.
+    """
+
+    _cache_key = None
+    _cached = None
 
     def get(self, request, *args, **kwargs):
+        last_modified = None
+        if self.response_cache is not None:
+            pk, last_modified = self.get_version(*args, **kwargs)
+
+        if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since:
+            if last_modified is None:
+                last_modified = self.get_last_modified(*args, **kwargs)
+            if not was_modified_since(last_modified, if_modified_since):
+                raise ErrorResponse(status.HTTP_304_NOT_MODIFIED, None, {'Last-Modified': last_modified})
+
+        if self.response_cache is not None:
+            try:
+                renderer, media_type = self._determine_renderer(request)
+            except ErrorResponse:
+                pass
+            else:
+                self._cache_key = self.response_cache.key(self.resource, pk, last_modified, media_type, request.GET.lists())
+                self._cached = self.response_cache.get(self._cache_key)
+                if self._cached is not None:
+                    raise ErrorResponse(status.HTTP_200_OK, None,
+                                        {'Last-Modified': last_modified, 'ETag': row_etag(last_modified)})
+
+        if self.single_flight is not None:
+            try:
+                renderer, media_type = self._determine_renderer(request)
+            except ErrorResponse:
+                pass
+            else:
+                key = self.get_flight_key(request, media_type, *args, **kwargs)
+                content, content_type, last_modified = self.single_flight.do(
+                    key, lambda: self.render_instance(request, renderer, media_type, *args, **kwargs))
+                self._cached = (content, content_type)
+                raise ErrorResponse(status.HTTP_200_OK, None,
+                                    {'Last-Modified': last_modified, 'ETag': row_etag(last_modified)})
+
         instance = super(ReadModelMixin, self).get(request, *args, **kwargs)
-        return Response(content=instance, headers={'Last-Modified':instance.last_modified})
+        return Response(content=instance, headers={'Last-Modified':instance.last_modified,
+                                                   'ETag': row_etag(instance.last_modified)})
 
+    def get_flight_key(self, request, media_type, *args, **kwargs):
+        """
+        Returns the key identifying a representation to `single_flight`
+        """
+        variant = repr((self.resource.__module__, self.resource.__name__, sorted(self.get_lookup(*args, **kwargs).items()),
+                        media_type, sorted(request.GET.lists())))
+        return 'serene:%s:%s' % (self.resource.model._meta, hashlib.md5(variant).hexdigest())
 
-class UpdateModelMixin(DrfModelMixin):
+    def render_instance(self, request, renderer, media_type, *args, **kwargs):
+        """
+        Fetches, serializes and renders the instance,
+        returning the (content, media_type, last_modified) shared with coalesced requests
+        """
+        instance = super(ReadModelMixin, self).get(request, *args, **kwargs)
+        content = renderer.render(self.filter_response(instance), media_type)
+        if self._cache_key is not None:
+            self.response_cache.set(self._cache_key, content, renderer.media_type)
+        return content, renderer.media_type, instance.last_modified
+
+    def get_last_modified(self, *args, **kwargs):
+        """
+        Fetches only the `last_modified` column of the instance,
+        so conditional GETs can be answered without loading the whole row
+        """
+        model = self.resource.model
+        try:
+            return self.get_queryset().filter(self.build_query(*args, **kwargs)).values_list('last_modified', flat=True).get()
+        except model.DoesNotExist:
+            raise ErrorResponse(status.HTTP_404_NOT_FOUND)
+
+    def get_version(self, *args, **kwargs):
+        """
+        Fetches only the primary key and `last_modified` columns of the instance,
+        which identify its cached representations
+        """
+        model = self.resource.model
+        try:
+            return self.get_queryset().filter(self.build_query(*args, **kwargs)).values_list('pk', 'last_modified').get()
+        except model.DoesNotExist:
+            raise ErrorResponse(status.HTTP_404_NOT_FOUND)
+
+    def render(self, response):
+        if self._cached is not None:
+            content, media_type = self._cached
+            resp = HttpResponse(content, content_type=media_type, status=response.status)
+            for (key, val) in response.headers.items():
+                resp[key] = val
+            return resp
+
+        resp = super(ReadModelMixin, self).render(response)
+        if self._cache_key is not None and resp.status_code == status.HTTP_200_OK:
+            self.response_cache.set(self._cache_key, resp.content, resp['Content-Type'])
+        return resp
+
+
+class UpdateModelMixin(ModelMixin):
+    """
+    Behavior to update a `model` instance on PUT requests.
+    PUTs with an If-Match header (holding the ETag of a GET) or an If-Unmodified-Since header
+    are only applied if the row hasn't changed since, and fail with 412 otherwise.
+    """
+
+    partial_update = False
     """
-    Behavior to update a `model` instance on PUT requests
+    Validate and write only the columns sent in the request with a single UPDATE,
+    instead of fetching the instance and saving every column
     """
+
     def put(self, request, *args, **kwargs):
+        if self.partial_update:
+            return self.update_columns(*args, **kwargs)
+
         model = self.resource.model
         try:
             self.model_instance = self.get_object(*args, **kwargs)
@@ -28,39 +467,500 @@ class UpdateModelMixin(DrfModelMixin):
                 setattr(self.model_instance, key, val)
         except model.DoesNotExist:
             raise ErrorResponse(status.HTTP_404_NOT_FOUND)
-        self.model_instance.save()
+
+        preconditions = self.get_preconditions(request)
+        if preconditions is None:
+            self.model_instance.save()
+        else:
+            # a conditional UPDATE instead of save(), so no concurrent write can slip in between
+            instance = self.model_instance
+            values = dict((field.name, field.pre_save(instance, False))
+                          for field in model._meta.local_fields if not field.primary_key)
+            self.update_if({'pk': instance.pk}, values, preconditions)
+            send_post_save(self.get_queryset(), instance)
         return self.model_instance
 
+    def update_columns(self, *args, **kwargs):
+        """
+        Updates the columns sent in the request and bumps `last_modified` in one UPDATE query,
+        then reads the instance back for the response
+        """
+        lookup = self.get_lookup(*args, **kwargs)
+        values, related = self.get_update_values(lookup, set(self.DATA or ()))
 
-class UpdateOrCreateModelMixin(DrfModelMixin):
+        self.update_if(lookup, values, self.get_preconditions(self.request))
+
+        self.model_instance = self.get_object(*args, **kwargs)
+        send_post_save(self.get_queryset(), self.model_instance)
+        for (key, val) in related.items():
+            setattr(self.model_instance, key, val)
+        return self.model_instance
+
+
+class UpdateOrCreateModelMixin(ModelMixin):
     """
-    Behavior to update or create a `model` instance on PUT requests
+    Behavior to update or create a `model` instance on PUT requests,
+    as a single upsert so concurrent PUTs to the same URL neither collide nor lose updates.
+    PUTs with an If-Match or If-Unmodified-Since header only update.
     """
     def put(self, request, *args, **kwargs):
         model = self.resource.model
-        try:
-            self.model_instance = self.get_object(*args, **kwargs)
-            for (key, val) in self.CONTENT.items():
-                setattr(self.model_instance, key, val)
-        except model.DoesNotExist:
-            self.model_instance = model(**self.get_instance_data(model, self.CONTENT, *args, **kwargs))
-            self.model_instance.save()
+        lookup = self.get_lookup(*args, **kwargs)
+        values, related = self.get_update_values(lookup)
+
+        data = self.get_instance_data(model, self.CONTENT, **lookup)
+        instance = model(**dict((key, val) for (key, val) in data.items() if key not in related))
+
+        preconditions = self.get_preconditions(request)
+        if preconditions is None:
+            self.model_instance, created = upsert(self.get_queryset(), lookup, values, instance)
+        else:
+            # a precondition refers to an existing row, so there is nothing to create
+            self.update_if(lookup, values, preconditions, missing=status.HTTP_412_PRECONDITION_FAILED)
+            self.model_instance, created = self.get_queryset().get(**lookup), False
+            send_post_save(self.get_queryset(), self.model_instance)
+        for (key, val) in related.items():
+            setattr(self.model_instance, key, val)
+
+        if created:
             return Response(status.HTTP_201_CREATED, self.model_instance)
-        self.model_instance.save()
         return self.model_instance
 
 
-class CreateModelMixin(DrfCreateModelMixin):
+class CreateModelMixin(ModelMixin, DrfCreateModelMixin):
+    """
+    Behavior to create a `model` instance on POST requests,
+    or one instance per item when the request body is a JSON array
+    """
+
+    bulk_batch_size = 500
+    """
+    Number of instances inserted per query by bulk creates,
+    where the database can return the primary keys of bulk inserts
+    """
 
     def post(self, request, *args, **kwargs):
+        if isinstance(getattr(self, 'DATA', None), list):
+            return self.post_bulk(request, *args, **kwargs)
+
         response = super(CreateModelMixin, self).post(request, *args, **kwargs)
         response.headers.update({
             'Content-Location': self.resource(self).url(response.raw_content)
         })
         return response
 
+    def post_bulk(self, request, *args, **kwargs):
+        """
+        Validates every item of the request body, then creates them all in one transaction.
+        Responds with a list holding the status and location of each item,
+        or, if any item is invalid, with 400 and the errors of the invalid items, creating none.
+        """
+        model = self.resource.model
+        resource = self.resource(self)
+        many_to_many = set(field.name for field in model._meta.many_to_many)
+
+        contents, results = [], []
+        for item in self.DATA:
+            if not isinstance(item, dict):
+                results.append({'status': status.HTTP_400_BAD_REQUEST,
+                                'errors': {'errors': [u'Each item must be an object.']}})
+                continue
+            try:
+                contents.append(resource.validate_request(item))
+                results.append(None)
+            except ErrorResponse, exc:
+                results.append({'status': exc.response.status, 'errors': exc.response.raw_content})
+
+        if any(results):
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST, results)
+
+        instances = []
+        for content in contents:
+            data = self.get_instance_data(model, content, *args, **kwargs)
+            instances.append(model(**dict((key, val) for (key, val) in data.items() if key not in many_to_many)))
+
+        queryset = self.get_queryset()
+        with atomic(using=queryset.db):
+            self.create_instances(queryset, instances)
+            for instance, content in zip(instances, contents):
+                for (key, val) in content.items():
+                    if key in many_to_many:
+                        setattr(instance, key, val)
+
+        results = [{'status': status.HTTP_201_CREATED, 'location': resource.url(instance)}
+                   for instance in instances]
+        raise ErrorResponse(status.HTTP_201_CREATED, results)
+
+    def create_instances(self, queryset, instances):
+        """
+        Inserts `instances` with bulk_create, `bulk_batch_size` at a time,
+        where the database returns the primary keys needed for their locations, one by one otherwise
+        """
+        connection = connections[queryset.db]
+        if hasattr(queryset, 'bulk_create') and getattr(connection.features, 'can_return_ids_from_bulk_insert', False):
+            for start in range(0, len(instances), self.bulk_batch_size):
+                queryset.bulk_create(instances[start:start + self.bulk_batch_size])
+            # bulk_create sends no signals, which serene's caches are invalidated on
+            for instance in instances:
+                post_save.send(sender=queryset.model, instance=instance, created=True, raw=False, using=queryset.db)
+        else:
+            for instance in instances:
+                instance.save(force_insert=True, using=queryset.db)
+
+
+class ListModelMixin(ModelMixin, DrfListModelMixin, LinkMixin):
+    """
+    Behavior to list a set of `model` instances on GET requests,
+    answering If-None-Match with 304 when the collection hasn't changed if `collection_etag` is set
+    """
+
+    collection_etag = False
+    """
+    Send an ETag with lists and answer If-None-Match, at the cost of an aggregate query
+    (COUNT and MAX(last_modified)) over the whole collection on every request.
+    Cursor paginated lists never get one, as they avoid counting.
+    """
+
+    stream = False
+    """
+    Stream unpaginated JSON lists to the client a few rows at a time
+    instead of building the whole list in memory
+    """
+
+    stream_chunk_size = 100
+    """
+    Number of rows serialized and written together when streaming
+    """
+
+    since_param = 'since'
+    """
+    Query parameter clients ask for the changes after a timestamp or a change feed cursor with
+    """
+
+    changes_limit = 100
+    """
+    Number of changes returned at a time by the change feed
+    """
+
+    ids_param = 'ids'
+    """
+    Query parameter clients fetch a batch of instances with, as comma separated primary keys
+    """
+
+    max_batch_ids = 100
+    """
+    Most instances fetched by one batch request
+    """
+
+    _streaming = False
+
+    def get(self, request, *args, **kwargs):
+        queryset = super(ListModelMixin, self).get(request, *args, **kwargs)
+        if hasattr(self._resource, 'prepare_list_queryset'):
+            queryset = self._resource.prepare_list_queryset(queryset)
+
+        ids = request.GET.getlist(self.ids_param) if self.ids_param else None
+        if ids:
+            raise ErrorResponse(status.HTTP_200_OK, self.get_batch(queryset, ids))
+
+        since = request.GET.get(self.since_param) if self.since_param else None
+        if since:
+            raise ErrorResponse(status.HTTP_200_OK, self.get_changes(queryset, since))
+
+        headers = {}
+        if self.collection_etag and not getattr(self, 'cursor_pagination', False):
+            etag = self.get_collection_etag(request, queryset)
+
+            if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            if etag in if_none_match or '*' in if_none_match:
+                raise ErrorResponse(status.HTTP_304_NOT_MODIFIED, None, {'ETag': quote_etag(etag)})
+            headers['ETag'] = quote_etag(etag)
+
+        self._streaming = self.stream and self.can_stream(request)
+        return Response(status.HTTP_200_OK, queryset, headers)
+
+    def get_changes(self, queryset, since):
+        """
+        Returns the rows of `queryset` modified, and the instances deleted, after `since`
+        in (last_modified, id) order, `changes_limit` at a time,
+        with the cursor to ask for the changes that follow
+        """
+        since_rows, since_deleted = self.parse_since(since)
+        ordering = ('last_modified', 'pk')
+
+        rows = list(queryset.filter(seek_query(ordering, since_rows)).order_by(*ordering)[:self.changes_limit + 1])
+        content_type = ContentType.objects.get_for_model(self.resource.model)
+        tombstones = Tombstone.objects.using(queryset.db).filter(content_type=content_type)
+        deleted = list(tombstones.filter(seek_query(ordering, since_deleted)).order_by(*ordering)[:self.changes_limit + 1])
+
+        # merge both feeds, then move each cursor past what was taken from it
+        changes = sorted([(row.last_modified, 0, row.pk, row) for row in rows] +
+                         [(tombstone.last_modified, 1, tombstone.pk, tombstone) for tombstone in deleted])
+        more = len(changes) > self.changes_limit
+        changes = changes[:self.changes_limit]
+
+        rows = [change[3] for change in changes if change[1] == 0]
+        deleted = [change[3] for change in changes if change[1] == 1]
+        if rows:
+            since_rows = [rows[-1].last_modified, rows[-1].pk]
+        if deleted:
+            since_deleted = [deleted[-1].last_modified, deleted[-1].pk]
+
+        pk = self.resource.model._meta.pk
+        cursor = encode_cursor('next', list(since_rows) + list(since_deleted))
+        links = {'next': {'href': self.get_link_builder().build([(self.since_param, cursor)]), 'rel': 'next'}}
+        return {
+            'links': links,
+            'changes': self._resource.filter_response(rows),
+            'deleted': [{'id': pk.to_python(tombstone.object_id), 'deleted': tombstone.last_modified} for tombstone in deleted],
+            'since': cursor,
+            'more': more,
+        }
+
+    def get_batch(self, queryset, ids):
+        """
+        Fetches the instances of `queryset` with the requested primary keys in one query,
+        and returns them in the requested order, with a 404 marker for each missing one
+        """
+        keys = self.parse_ids(ids)
+        rows = dict((row.pk, row) for row in queryset.filter(pk__in=keys))
+        serialized = dict(zip(rows.keys(), self._resource.filter_response(rows.values())))
+        return {
+            'results': [serialized.get(key, {'id': key, 'status': status.HTTP_404_NOT_FOUND}) for key in keys],
+        }
+
+    def parse_ids(self, ids):
+        """
+        Returns the distinct primary keys of `ids` parameters, in order
+        """
+        pk = self.resource.model._meta.pk
+        keys = []
+        for value in (value.strip() for param in ids for value in param.split(',')):
+            if not value:
+                continue
+            try:
+                keys.append(pk.to_python(value))
+            except ValidationError:
+                raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                    {'detail': '%r is not a valid %s' % (value, self.ids_param)})
+        keys = unique(keys)
+        if len(keys) > self.max_batch_ids:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                {'detail': 'At most %s %s can be fetched at a time' % (self.max_batch_ids, self.ids_param)})
+        return keys
+
+    def parse_since(self, since):
+        """
+        Returns the ((last_modified, id), (last_modified, id)) positions of the changed rows
+        and the tombstones after which a `since` cursor or timestamp asks for changes
+        """
+        timestamp, exact = parse_datetime_header(since)
+        if timestamp is not None:
+            return [timestamp, 0], [timestamp, 0]
+        ordering = ('last_modified', 'pk')
+        try:
+            direction, values = decode_cursor(since)
+            if len(values) != 4:
+                raise ValueError('Expected 4 cursor values, got %s' % len(values))
+            return (convert_position(self.resource.model, ordering, values[:2]),
+                    convert_position(Tombstone, ordering, values[2:]))
+        except ValueError:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                {'detail': '%s must be a timestamp or a cursor' % self.since_param})
+
+    def can_stream(self, request):
+        """
+        Only plain (not indented) JSON of unpaginated lists is streamed
+        """
+        if isinstance(self, DrfPaginatorMixin):
+            return False
+        try:
+            renderer, media_type = self._determine_renderer(request)
+        except ErrorResponse:
+            return False
+        return renderer.format == 'json' and not get_media_type_params(media_type).get('indent')
+
+    def filter_response(self, obj):
+        if not self._streaming:
+            return super(ListModelMixin, self).filter_response(obj)
+
+        # rows are serialized lazily, once the view has returned,
+        # so hold on to the absolute script prefix urls are reversed with
+        self._script_prefix = get_script_prefix()
+        resource = self._resource
+        return (resource.filter_response(instance) for instance in obj.iterator())
+
+    def render(self, response):
+        if not self._streaming:
+            return super(ListModelMixin, self).render(response)
+
+        resp = StreamingHttpResponse(self.stream_json(response.cleaned_content),
+                                     content_type='application/json', status=response.status)
+        for (key, val) in response.headers.items():
+            resp[key] = val
+        return resp
+
+    def stream_json(self, rows):
+        """
+        Writes out the JSON array of serialized rows, `stream_chunk_size` rows at a time
+        """
+        encoder = DateTimeAwareJSONEncoder()
+        separator = '['
+        while True:
+            original_prefix = get_script_prefix()
+            set_script_prefix(self._script_prefix)
+            try:
+                chunk = list(islice(rows, self.stream_chunk_size))
+            finally:
+                set_script_prefix(original_prefix)
 
-class PaginatorMixin(DrfPaginatorMixin):
+            if not chunk:
+                break
+            yield separator + ','.join(encoder.encode(row) for row in chunk)
+            separator = ','
+
+        yield '[]' if separator == '[' else ']'
+
+    def get_collection_etag(self, request, queryset):
+        """
+        Builds a validator for the collection from a single aggregate query
+        (newest `last_modified` and row count) plus the query parameters
+        (page, limit, ...) and the Accept header, without fetching any rows
+        """
+        stats = queryset.aggregate(last_modified=Max('last_modified'), count=Count('pk'))
+        key = repr((
+            stats['last_modified'],
+            stats['count'],
+            sorted(request.GET.lists()),
+            request.META.get('HTTP_ACCEPT'),
+        ))
+        return hashlib.md5(key).hexdigest()
+
+
+class PaginatorMixin(DrfPaginatorMixin, LinkMixin):
+
+    cursor_pagination = False
+    """
+    Page querysets by seeking on `cursor_ordering` with an opaque `cursor` parameter
+    instead of page numbers, so deep pages need neither OFFSET nor COUNT(*)
+    """
+
+    cursor_ordering = ('last_modified', 'id')
+    """
+    Unique, non-null and indexed ordering to seek on when `cursor_pagination` is set
+    """
+
+    count_strategy = None
+    """
+    How the total is counted, one of the strategies in `serene.paginator`.
+    Defaults to an exact count on every request.
+    """
+
+    def filter_response(self, obj):
+        """
+        Given the response content, paginate and then serialize.
+        Like djangorestframework's, but with cursor pagination and pluggable counts.
+        """
+        # We don't want to paginate responses for anything other than GET requests
+        if self.method.upper() != 'GET':
+            return self._resource.filter_response(obj)
+
+        if self.cursor_pagination and isinstance(obj, QuerySet):
+            return self.filter_response_by_cursor(obj)
+
+        paginator = Paginator(obj, self.get_limit(), self.count_strategy)
+
+        try:
+            page_num = int(self.request.GET.get('page', '1'))
+        except ValueError:
+            raise ErrorResponse(status.HTTP_404_NOT_FOUND,
+                                {'detail': 'That page contains no results'})
+
+        if page_num not in paginator.page_range:
+            raise ErrorResponse(status.HTTP_404_NOT_FOUND,
+                                {'detail': 'That page contains no results'})
+        page = paginator.page(page_num)
+
+        serialized_object_list = self._resource.filter_response(page.object_list)
+        serialized_page_info = self.serialize_page_info(page)
+
+        serialized_page_info['results'] = serialized_object_list
+
+        return serialized_page_info
+
+    def filter_response_by_cursor(self, queryset):
+        """
+        Keyset counterpart of `filter_response`, fetching one row past the page
+        to find out whether there is more to follow
+        """
+        limit = self.get_limit()
+        ordering = list(self.cursor_ordering)
+
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            try:
+                direction, position = decode_cursor(cursor)
+                position = convert_position(queryset.model, [key.lstrip('-') for key in ordering], position)
+            except ValueError:
+                raise ErrorResponse(status.HTTP_404_NOT_FOUND,
+                                    {'detail': 'That page contains no results'})
+        else:
+            direction, position = 'next', None
+
+        if direction == 'previous':
+            ordering = reverse_ordering(ordering)
+        if position is not None:
+            queryset = queryset.filter(seek_query(ordering, position))
+
+        object_list = list(queryset.order_by(*ordering)[:limit + 1])
+        has_more = len(object_list) > limit
+        object_list = object_list[:limit]
+        if direction == 'previous':
+            object_list.reverse()
+
+        links = {'self': {'href': self.get_link_builder().uri, 'rel': 'self'}}
+        links['first'] = {'href': self.url_with_cursor(None), 'rel': 'first'}
+        if direction == 'next':
+            has_next, has_previous = has_more, position is not None
+        else:
+            has_next, has_previous = True, has_more
+
+        if object_list:
+            if has_next:
+                cursor = encode_cursor('next', self.cursor_position(object_list[-1]))
+                links['next'] = {'href': self.url_with_cursor(cursor), 'rel': 'next'}
+            if has_previous:
+                cursor = encode_cursor('previous', self.cursor_position(object_list[0]))
+                links['previous'] = {'href': self.url_with_cursor(cursor), 'rel': 'previous'}
+
+        return {
+            'links': links,
+            'per_page': limit,
+            'results': self._resource.filter_response(object_list),
+        }
+
+    def cursor_position(self, instance):
+        """
+        Returns the values of `cursor_ordering` for the given instance
+        """
+        return [getattr(instance, key.lstrip('-')) for key in self.cursor_ordering]
+
+    def url_with_cursor(self, cursor):
+        """
+        Constructs a url used for getting the next/previous urls in cursor mode,
+        replacing cursor & limit with updated values
+        """
+        params, remove = [], ['page']
+        if cursor is not None:
+            params.append(('cursor', cursor))
+        else:
+            remove.append('cursor')
+
+        limit = self.get_limit()
+        if limit != self.limit:
+            params.append(('limit', limit))
+
+        return self.get_link_builder().build(params, remove)
 
     def first(self, page):
         """
@@ -79,24 +979,23 @@ class PaginatorMixin(DrfPaginatorMixin):
         Constructs a url used for getting the next/previous urls,
         replacing page & limit with updated number
         """
-        url = EnhancedURLObject.parse(self.request.build_absolute_uri())
-
+        params, remove = [], []
         if page_number != 1:
-            url |= 'page', page_number
+            params.append(('page', page_number))
         else:
-            url -= 'page'
+            remove.append('page')
 
         limit = self.get_limit()
         if limit != self.limit:
-            url |= 'limit', limit
+            params.append(('limit', limit))
 
-        return url
+        return self.get_link_builder().build(params, remove)
 
     def serialize_page_info(self, page):
         """
         This is some useful information that is added to the response
         """
-        links = {'self': {'href': self.request.build_absolute_uri(), 'rel': 'self'}}
+        links = {'self': {'href': self.get_link_builder().uri, 'rel': 'self'}}
 
         next_page = self.next(page)
         if next_page:
@@ -114,10 +1013,13 @@ class PaginatorMixin(DrfPaginatorMixin):
         if last_page:
             links['last'] = {'href': last_page, 'rel': 'last'}
 
-        return {
+        page_info = {
             'links': links,
             'page': page.number,
             'pages': page.paginator.num_pages,
             'per_page': self.get_limit(),
             'total': page.paginator.count,
         }
+        if getattr(page.paginator, 'approximate', False):
+            page_info['approximate'] = True
+        return page_info
@@ -1,12 +1,38 @@
+from django.contrib.contenttypes.models import ContentType
 from django.db.models import *
+from django.db.models.signals import post_delete
 
 
 class Model(Model):
-    last_modified = DateTimeField(auto_now=True)
+    last_modified = DateTimeField(auto_now=True, db_index=True)
+
+    record_tombstones = False
+    """
+    Leave a Tombstone behind when an instance is deleted, for change feeds to report.
+    Needs the serene_tombstone table, created by syncdb.
+    """
 
     class Meta:
         abstract = True
 
     @permalink
     def get_absolute_url(self):
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+
+class Tombstone(Model):
+    """
+    Marks the deletion of an instance of a serene model at `last_modified`
+    """
+    content_type = ForeignKey(ContentType)
+    object_id = CharField(max_length=255)
+
+    record_tombstones = False
+
+
+def record_tombstone(sender, instance, **kwargs):
+    if isinstance(instance, Model) and instance.record_tombstones:
+        Tombstone.objects.using(kwargs.get('using')).create(
+            content_type=ContentType.objects.get_for_model(sender), object_id=instance.pk)
+
+post_delete.connect(record_tombstone, dispatch_uid='serene.models.record_tombstone')
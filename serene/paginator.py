@@ -0,0 +1,112 @@
+import hashlib
+
+from django.core.cache import cache as default_cache, get_cache
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.utils.encoding import smart_str
+from serene.cache import Versions
+
+
+class Paginator(DjangoPaginator):
+    """
+    Paginator that takes its total from a pluggable count strategy.
+    `approximate` tells whether that total is an estimate.
+    """
+    def __init__(self, object_list, per_page, count_strategy=None, **kwargs):
+        super(Paginator, self).__init__(object_list, per_page, **kwargs)
+        self.count_strategy = count_strategy or ExactCount()
+        self.approximate = False
+
+    def _get_count(self):
+        if self._count is None:
+            self._count, self.approximate = self.count_strategy.count(self.object_list)
+        return self._count
+    count = property(_get_count)
+
+
+class ExactCount(object):
+    """
+    Counts the objects on every request, with COUNT(*) for querysets
+    """
+    def count(self, object_list):
+        """
+        Returns a (count, approximate) tuple
+        """
+        if isinstance(object_list, QuerySet):
+            return object_list.count(), False
+        return len(object_list), False
+
+
+class CachedCount(ExactCount):
+    """
+    Keeps exact queryset counts in Django's cache framework for `timeout` seconds.
+    Counts of a model are dropped as soon as any of its instances is saved or deleted.
+    """
+    def __init__(self, timeout=60, cache_alias=None):
+        self.timeout = timeout
+        self.cache = get_cache(cache_alias) if cache_alias else default_cache
+        self.generations = Versions(self.cache, 'serene:count')
+
+    def count(self, object_list):
+        if not isinstance(object_list, QuerySet):
+            return super(CachedCount, self).count(object_list)
+
+        key = self.cache_key(object_list)
+        count = self.cache.get(key)
+        if count is None:
+            count = object_list.count()
+            self.cache.set(key, count, self.timeout)
+        return count, False
+
+    def cache_key(self, queryset):
+        model = queryset.model
+        try:
+            sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        except EmptyResultSet:
+            sql, params = None, ()
+        query = hashlib.md5(smart_str(repr((queryset.db, sql, params)))).hexdigest()
+        return 'serene:count:%s:%s:%s' % (model._meta, self.generations.get(model), query)
+
+
+class EstimatedCount(ExactCount):
+    """
+    Reads the row count of unfiltered querysets from the database statistics
+    (PostgreSQL and MySQL) instead of counting, and marks it as approximate.
+    Filtered querysets, other backends and tables estimated below `threshold` rows
+    are counted by `fallback`, exactly by default.
+    """
+    def __init__(self, threshold=10000, fallback=None):
+        self.threshold = threshold
+        self.fallback = fallback or ExactCount()
+
+    def count(self, object_list):
+        if isinstance(object_list, QuerySet) and self.is_unfiltered(object_list):
+            estimate = self.estimate(object_list)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate, True
+        return self.fallback.count(object_list)
+
+    def is_unfiltered(self, queryset):
+        query = queryset.query
+        return not (query.where.children or query.having.children or query.distinct or
+                    query.low_mark or query.high_mark is not None)
+
+    def estimate(self, queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+
+        if connection.vendor == 'postgresql':
+            sql = 'SELECT reltuples FROM pg_class WHERE relname = %s'
+        elif connection.vendor == 'mysql':
+            sql = 'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s'
+        else:
+            return None
+
+        cursor = connection.cursor()
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+        if row is None or row[0] is None:
+            return None
+        return int(row[0])
@@ -0,0 +1,51 @@
+"""
+Compact renderers for serene's views, opted into by listing them in a view's `renderers`,
+e.g. `renderers = FAST_RENDERERS`, and picked by content negotiation as usual.
+"""
+import datetime
+import decimal
+
+from django.utils.encoding import smart_unicode
+from djangorestframework.renderers import DEFAULT_RENDERERS, BaseRenderer
+from serene.compat import msgpack
+
+__all__ = (
+    'MessagePackRenderer',
+    'FAST_RENDERERS',
+)
+
+
+def encode_fallback(obj):
+    """
+    Encodes the values msgpack doesn't handle natively.
+    It only calls it for those values, never for the dicts and lists around them.
+    """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    return smart_unicode(obj)
+
+
+if msgpack:
+    class MessagePackRenderer(BaseRenderer):
+        """
+        Renderer which serializes to MessagePack.
+        Byte and unicode strings both go out as msgpack strings, as keys are byte strings on python 2.
+        """
+
+        media_type = 'application/msgpack'
+        format = 'msgpack'
+
+        def render(self, obj=None, media_type=None):
+            if obj is None:
+                return ''
+            return msgpack.packb(obj, default=encode_fallback, use_bin_type=False)
+else:
+    MessagePackRenderer = None
+
+
+FAST_RENDERERS = DEFAULT_RENDERERS
+
+if MessagePackRenderer:
+    FAST_RENDERERS += (MessagePackRenderer,)
@@ -1,13 +1,445 @@
+import inspect
+import warnings
+from functools import partial
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.db import models
+from django.utils.encoding import is_protected_type, smart_unicode
+from djangorestframework import status
 from djangorestframework.resources import ModelResource as DrfModelResource
+from djangorestframework.response import ErrorResponse
+from djangorestframework.serializer import _fields_to_list, _SkipField
+from serene.db import has_index
 from serene.serializers import RelatedSerializer
 
+# kinds of entries in a serialization plan
+FIELD, ATTRIBUTE, METHOD = 'field', 'attribute', 'method'
+
+
+def unique(paths):
+    seen = set()
+    return [path for path in paths if not (path in seen or seen.add(path))]
+
 
 class ModelResource(DrfModelResource):
     exclude = ()
     include = ('links',)
     related_serializer = RelatedSerializer
 
+    select_related = None
+    """
+    Relations to load with select_related() when serving this resource,
+    or None to use the forward relations found in `fields`/`include`.
+    """
+
+    prefetch_related = None
+    """
+    Relations to load with prefetch_related() when serving this resource,
+    or None to use the many-to-many relations found in `fields`/`include`.
+    """
+
+    expand = {}
+    """
+    Relations clients can have embedded with `expand_param`, mapped to the resource to serialize them with
+    """
+
+    expand_param = 'expand'
+    """
+    Query parameter clients expand related objects with, e.g. ?expand=dummy,dummy.owner
+    """
+
+    max_expand_depth = 2
+    """
+    How many levels of related objects one request can expand
+    """
+
+    fields_param = 'fields'
+    """
+    Query parameter clients narrow the serialized keys with, e.g. ?fields=id,name,dummy.title,
+    or None to always serialize every key.
+    """
+
+    filter_fields = ()
+    """
+    Fields clients can filter lists on with query parameters, e.g. ?name=x or ?last_modified__gte=...
+    """
+
+    filter_lookups = ('exact', 'in', 'gt', 'gte', 'lt', 'lte', 'isnull')
+    """
+    Lookups allowed on `filter_fields`, `in` taking comma separated values
+    """
+
+    ordering_fields = ()
+    """
+    Fields clients can order lists by with `ordering_param`, e.g. ?ordering=-last_modified,name.
+    When set, list orderings end with the primary key so rows with equal keys always come in the same order.
+    """
+
+    ordering_param = 'ordering'
+
+    require_index = False
+    """
+    Refuse `filter_fields` and `ordering_fields` without a database index, instead of warning about them
+    """
+
+    @classmethod
+    def check_indexes(cls):
+        """
+        Warns about, or with `require_index` refuses, filter and ordering fields
+        lists would be scanned for, once per resource class
+        """
+        if '_indexes_checked' in cls.__dict__:
+            return
+        unindexed = [name for name in unique(tuple(cls.filter_fields) + tuple(cls.ordering_fields))
+                     if not has_index(cls.model, name)]
+        if unindexed:
+            message = '%s.%s filters or orders %s on %s, which %s no index' % (
+                cls.__module__, cls.__name__, cls.model._meta, ', '.join(unindexed),
+                'has' if len(unindexed) == 1 else 'have')
+            if cls.require_index:
+                raise ImproperlyConfigured(message)
+            warnings.warn(message, RuntimeWarning)
+        cls._indexes_checked = True
+
+    @classmethod
+    def get_serialization_plan(cls, model):
+        """
+        Returns the ordered (name, attribute, key, kind) entries used to serialize instances of `model`,
+        compiled once per resource class and model rather than introspected for every object.
+        Plain model fields come first, then relations and attributes,
+        then resource methods such as `links`, so they see everything serialized before them.
+        """
+        plans = cls.__dict__.get('_serialization_plans')
+        if plans is None:
+            plans = cls._serialization_plans = {}
+
+        if model not in plans:
+            opts = model._meta
+            if cls.fields:
+                names = _fields_to_list(cls.fields)
+            else:
+                exclude = set(cls.exclude or ())
+                default = [field.name for field in opts.fields + opts.many_to_many]
+                names = [name for name in default + list(cls.include or ()) if name not in exclude]
+
+            concrete_fields = dict((field.name, field) for field in opts.fields if field.rel is None)
+            fields, attributes, methods = [], [], []
+            for name in names:
+                key = cls.rename.get(name, name)
+                method = getattr(cls, name, None)
+                if inspect.ismethod(method) and len(inspect.getargspec(method)[0]) == 2:
+                    methods.append((name, name, key, METHOD))
+                elif name in concrete_fields:
+                    fields.append((name, concrete_fields[name].attname, key, FIELD))
+                else:
+                    attributes.append((name, name, key, ATTRIBUTE))
+
+            plans[model] = tuple(fields + attributes + methods)
+        return plans[model]
+
+    @classmethod
+    def get_related_fields(cls):
+        """
+        Returns the (select_related, prefetch_related) relations to load
+        for the fields this resource serializes, worked out once per resource class.
+        """
+        if '_related_fields' not in cls.__dict__:
+            opts = cls.model._meta
+            if cls.fields:
+                names = set(_fields_to_list(cls.fields))
+            else:
+                default = [field.name for field in opts.fields + opts.many_to_many]
+                names = set(default + list(cls.include or ())) - set(cls.exclude or ())
+
+            select_related = cls.select_related
+            if select_related is None:
+                select_related = tuple(field.name for field in opts.fields
+                                       if field.rel is not None and field.name in names)
+
+            prefetch_related = cls.prefetch_related
+            if prefetch_related is None:
+                prefetch_related = tuple(field.name for field in opts.many_to_many if field.name in names)
+
+            cls._related_fields = (tuple(select_related), tuple(prefetch_related))
+        return cls._related_fields
+
+    def get_selection(self):
+        """
+        Returns the keys selected with the `fields_param` query parameter, as a dict
+        of each key to the set of keys selected on its related objects (empty for all of them),
+        or None if no keys were selected.
+        """
+        if '_selection' not in self.__dict__:
+            request = getattr(self.view, 'request', None)
+            value = request.GET.get(self.fields_param) if request is not None and self.fields_param else None
+            self._selection = self.parse_selection(value) if value else None
+        return self._selection
+
+    def parse_selection(self, value):
+        """
+        Parses a comma separated list of keys, where `key.nested` selects a key of a related object.
+        Raises a 400 ErrorResponse for keys this resource doesn't serialize.
+        """
+        names = dict((key, name) for name, attribute, key, kind in self.get_serialization_plan(self.model))
+        selection, unknown = {}, []
+        for item in value.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            key, _, nested = item.partition('.')
+            if key not in names:
+                unknown.append(item)
+                continue
+            selected = selection.setdefault(key, set())
+            if nested:
+                serializer = super(ModelResource, self).get_related_serializer(names[key])
+                if nested not in getattr(serializer, 'selectable', ()):
+                    unknown.append(item)
+                    continue
+                selected.add(nested)
+
+        if unknown:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                {'detail': 'Unknown fields: %s' % ', '.join(unknown)})
+        return selection
+
+    def get_expansion(self):
+        """
+        Returns the relations expanded with the `expand_param` query parameter,
+        as a dict of each relation name to the expansion of its own resource
+        """
+        if '_expansion' not in self.__dict__:
+            request = getattr(self.view, 'request', None)
+            value = request.GET.get(self.expand_param) if request is not None and self.expand_param else None
+            self._expansion = self.parse_expansion(value) if value else {}
+        return self._expansion
+
+    def parse_expansion(self, value):
+        """
+        Parses a comma separated list of dotted relation paths into a tree of relation names.
+        Raises a 400 ErrorResponse for relations that can't be expanded or that are too deep.
+        """
+        expansion, unknown = {}, []
+        for item in value.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            path = item.split('.')
+            if len(path) > self.max_expand_depth:
+                raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                    {'detail': 'Fields can be expanded at most %s levels deep' % self.max_expand_depth})
+            resource, tree = type(self), expansion
+            for key in path:
+                names = dict((key, name) for name, attribute, key, kind in resource.get_serialization_plan(resource.model))
+                name = names.get(key)
+                if name not in resource.expand:
+                    unknown.append(item)
+                    break
+                resource, tree = resource.expand[name], tree.setdefault(name, {})
+
+        if unknown:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                {'detail': 'Fields that cannot be expanded: %s' % ', '.join(unknown)})
+        return expansion
+
+    def get_expanded_resource(self, name):
+        """
+        Returns the resource serializing the expanded relation `name`,
+        which expands what the request expanded below it
+        """
+        resources = self.__dict__.setdefault('_expanded_resources', {})
+        if name not in resources:
+            resource = self.expand[name](self.view)
+            resource._expansion = self.get_expansion()[name]
+            resource._selection = None
+            resources[name] = resource
+        return resources[name]
+
+    def get_expanded_paths(self):
+        """
+        Returns the (select_related, prefetch_related) paths loading every expanded relation
+        along with the relations their resources load, so whole pages are expanded in a few queries
+        """
+        select_related, prefetch_related = [], []
+        for name in self.get_expansion():
+            try:
+                field = self.model._meta.get_field(name)
+                forward = field.rel is not None and not isinstance(field, models.ManyToManyField)
+            except models.FieldDoesNotExist:
+                forward = False
+
+            resource = self.get_expanded_resource(name)
+            nested_select, nested_prefetch = resource.get_related_fields()
+            expanded_select, expanded_prefetch = resource.get_expanded_paths()
+            if forward:
+                select_related.append(name)
+                select_related.extend('%s__%s' % (name, path) for path in nested_select + tuple(expanded_select))
+                prefetch_related.extend('%s__%s' % (name, path) for path in nested_prefetch + tuple(expanded_prefetch))
+            else:
+                prefetch_related.append(name)
+                prefetch_related.extend('%s__%s' % (name, path)
+                                        for path in nested_select + nested_prefetch + tuple(expanded_select + expanded_prefetch))
+        return select_related, prefetch_related
+
+    def get_selected_plan(self, model):
+        """
+        Returns the entries of the serialization plan selected by the request
+        """
+        plans = self.__dict__.setdefault('_selected_plans', {})
+        if model not in plans:
+            plan = self.get_serialization_plan(model)
+            selection = self.get_selection()
+            if selection is not None:
+                plan = tuple(entry for entry in plan if entry[2] in selection)
+            plans[model] = plan
+        return plans[model]
+
+    def get_only_fields(self):
+        """
+        Returns the fields to load with only() for the keys selected by the request,
+        or None to load them all, as methods, properties and links may need any column.
+        The views' own reads (Last-Modified, change feed and cursor positions) are always loaded.
+        """
+        if self.get_selection() is None:
+            return None
+        opts = self.model._meta
+        columns = set(field.name for field in opts.fields)
+        names = [opts.pk.name]
+        for name, attribute, key, kind in self.get_selected_plan(self.model):
+            if name not in columns:
+                return None
+            names.append(name)
+
+        names.append('last_modified')
+        if getattr(self.view, 'cursor_pagination', False):
+            names.extend(key.lstrip('-') for key in self.view.cursor_ordering)
+        return unique(name for name in names if name in columns)
+
+    def prepare_queryset(self, queryset):
+        """
+        Applies select_related/prefetch_related to the querysets the views read this resource from,
+        so related objects aren't fetched one query at a time while serializing,
+        and narrows them to the columns selected by the request.
+        """
+        select_related, prefetch_related = self.get_related_fields()
+        expanded_select, expanded_prefetch = self.get_expanded_paths()
+        select_related = unique(select_related + tuple(expanded_select))
+        prefetch_related = unique(prefetch_related + tuple(expanded_prefetch))
+
+        selection = self.get_selection()
+        if selection is not None:
+            selected = set(name for name, attribute, key, kind in self.get_selected_plan(self.model))
+            select_related = [path for path in select_related if path.split('__')[0] in selected]
+            prefetch_related = [path for path in prefetch_related if path.split('__')[0] in selected]
+            only = self.get_only_fields()
+            if only:
+                queryset = queryset.only(*only)
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        # prefetch_related is only available from django 1.4
+        if prefetch_related and hasattr(queryset, 'prefetch_related'):
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def prepare_list_queryset(self, queryset):
+        """
+        Filters and orders the querysets lists are read from as the request asks,
+        with `filter_fields` and `ordering_fields`
+        """
+        if not (self.filter_fields or self.ordering_fields):
+            return queryset
+        self.check_indexes()
+
+        request = getattr(self.view, 'request', None)
+        params = request.GET if request is not None else {}
+        filters = self.parse_filters(params)
+        if filters:
+            queryset = queryset.filter(**filters)
+
+        if self.ordering_fields:
+            value = params.get(self.ordering_param) if self.ordering_param else None
+            ordering = self.parse_ordering(value) if value else []
+            if not ordering:
+                ordering = list(queryset.query.order_by or self.model._meta.ordering)
+            if not ordering or ordering[-1].lstrip('-') not in ('pk', self.model._meta.pk.name):
+                ordering.append('pk')
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def parse_filters(self, params):
+        """
+        Turns the query parameters naming `filter_fields` into field lookups.
+        Raises a 400 ErrorResponse for lookups that aren't allowed and values that aren't valid.
+        """
+        filters, invalid = {}, []
+        for param, value in params.items():
+            name, _, lookup = param.partition('__')
+            if name not in self.filter_fields:
+                continue
+            lookup = lookup or 'exact'
+            if lookup not in self.filter_lookups:
+                invalid.append(param)
+                continue
+
+            field = self.model._meta.get_field(name)
+            if field.rel is not None:
+                field = field.rel.get_related_field()
+            try:
+                if lookup == 'in':
+                    value = [field.to_python(item) for item in value.split(',')]
+                elif lookup == 'isnull':
+                    value = value.lower() in ('1', 'true', 'yes')
+                else:
+                    value = field.to_python(value)
+            except ValidationError:
+                invalid.append(param)
+                continue
+            filters['%s__%s' % (name, lookup)] = value
+
+        if invalid:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                {'detail': 'Invalid filters: %s' % ', '.join(invalid)})
+        return filters
+
+    def parse_ordering(self, value):
+        """
+        Parses a comma separated list of `ordering_fields`, each optionally prefixed with - to descend.
+        Raises a 400 ErrorResponse for fields lists can't be ordered by.
+        """
+        ordering, unknown = [], []
+        for key in value.split(','):
+            key = key.strip()
+            if not key:
+                continue
+            if key.lstrip('-') not in self.ordering_fields:
+                unknown.append(key)
+                continue
+            ordering.append(key)
+
+        if unknown:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                {'detail': 'Unknown ordering: %s' % ', '.join(unknown)})
+        return ordering
+
+    def get_bound_form(self, data=None, files=None, method=None):
+        """
+        Like djangorestframework's, but the form of a partial update (see UpdateModelMixin.partial_update)
+        only validates the fields that were sent, as the others aren't written
+        """
+        form = super(ModelResource, self).get_bound_form(data, files, method)
+        if form is not None and form.is_bound and self.is_partial_update():
+            sent = set(data or ()) | set(files or ())
+            for name in list(form.fields):
+                if name not in sent:
+                    del form.fields[name]
+        return form
+
+    def is_partial_update(self):
+        view = self.view
+        return (getattr(view, 'partial_update', False) and getattr(view, 'request', None) is not None
+                and view.method == 'PUT')
+
     def links(self, instance):
         self._links['self'] = {
             'href': self.url(instance),
@@ -19,9 +451,58 @@ class ModelResource(DrfModelResource):
         self._links = {}
         return super(ModelResource, self).filter_response(obj)
 
+    def serialize_model(self, instance):
+        """
+        Serializes a model instance following the resource's serialization plan.
+        Plain field values skip the related serializer machinery altogether,
+        unless the resource overrides `serialize_val` or `serialize_key`.
+        """
+        if not isinstance(instance, models.Model):
+            return super(ModelResource, self).serialize_model(instance)
+
+        cls = type(self)
+        custom_keys = cls.serialize_key.im_func is not ModelResource.serialize_key.im_func
+        fast_fields = ((self.depth is None or self.depth > 0) and not custom_keys and
+                       cls.serialize_val.im_func is ModelResource.serialize_val.im_func)
+
+        self._links = {}
+        data = {}
+        for name, attribute, key, kind in self.get_selected_plan(type(instance)):
+            if custom_keys:
+                key = self.serialize_key(name)
+            try:
+                if kind == METHOD:
+                    obj = getattr(self, name)(instance)
+                elif kind == FIELD:
+                    obj = getattr(instance, attribute)
+                    if fast_fields:
+                        data[key] = obj if is_protected_type(obj) else smart_unicode(obj, strings_only=True)
+                        continue
+                elif hasattr(instance, attribute):
+                    obj = getattr(instance, attribute)
+                else:
+                    continue
+                data[key] = self.serialize_val(name, obj)
+            except _SkipField:
+                pass
+        return data
+
+    def get_related_serializer(self, key):
+        """
+        Narrows the related serializer to the keys the request selected on `key`, if any
+        """
+        serializer = super(ModelResource, self).get_related_serializer(key)
+        selection = self.get_selection()
+        if selection and selection.get(self.rename.get(key, key)):
+            return partial(serializer, only=selection[self.rename.get(key, key)])
+        return serializer
+
     def serialize_val(self, key, obj):
+        if key in self.get_expansion():
+            return self.serialize_expanded(key, obj)
+
         serialized_val = super(ModelResource, self).serialize_val(key, obj)
-        if isinstance(obj, models.Model):
+        if isinstance(obj, models.Model) and 'links' in serialized_val and 'title' in serialized_val:
             self._links[key] = {
                 'href': serialized_val['links']['self']['href'],
                 'rel': key,
@@ -29,4 +510,23 @@ class ModelResource(DrfModelResource):
             }
             return serialized_val
         else:
-            return serialized_val
\ No newline at end of file
+            return serialized_val
+
+    def serialize_expanded(self, key, obj):
+        """
+        Embeds the full representation of related objects, as serialized by their own resource
+        """
+        resource = self.get_expanded_resource(key)
+        if isinstance(obj, models.Manager):
+            return [resource.serialize_model(item) for item in obj.all()]
+        if not isinstance(obj, models.Model):
+            return resource.serialize(obj)
+
+        serialized_val = resource.serialize_model(obj)
+        if 'self' in serialized_val.get('links', {}):
+            self._links[key] = {
+                'href': serialized_val['links']['self']['href'],
+                'rel': key,
+                'title': unicode(obj),
+            }
+        return serialized_val
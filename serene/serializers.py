@@ -4,20 +4,34 @@ from djangorestframework.serializer import Serializer
 
 class RelatedSerializer(Serializer):
 
+    selectable = ('id', 'title', 'links')
+    """
+    Keys of related objects clients can select with `?fields=`
+    """
+
+    def __init__(self, depth=None, stack=[], only=None, **kwargs):
+        super(RelatedSerializer, self).__init__(depth=depth, stack=stack, **kwargs)
+        self.only = only
+
     def serialize_model(self, instance):
         """
         serialize_model serializes both Model and dict.
+        Only the `only` keys of a Model are serialized, if given.
         """
         if isinstance(instance, models.Model):
-            return {
-                'id': instance.id,
-                'title': unicode(instance),
-                'links': {
+            only = self.only or self.selectable
+            data = {}
+            if 'id' in only:
+                data['id'] = instance.id
+            if 'title' in only:
+                data['title'] = unicode(instance)
+            if 'links' in only:
+                data['links'] = {
                     'self': {
                         'href': instance.get_absolute_url(),
                         'rel': 'self',
                     }
-                },
-            }
+                }
+            return data
         else:
-            return super(RelatedSerializer, self).serialize_model(instance)
\ No newline at end of file
+            return super(RelatedSerializer, self).serialize_model(instance)
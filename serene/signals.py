@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# sent by views with `timing` set once a request has been served,
+# with the serene.instrumentation.Timings of the request
+request_timed = Signal(providing_args=['request', 'response', 'timings'])
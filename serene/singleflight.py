@@ -0,0 +1,112 @@
+import sys
+import threading
+import time
+import uuid
+
+from django.core.cache import cache as default_cache, get_cache
+
+
+class Call(object):
+    """
+    A computation in flight, and its outcome once `done` is set
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key made in this process:
+    the first caller computes the result, the others wait for it and share it,
+    or the exception it raised. Safe to share between the threads of a WSGI server.
+    `calls` and `shared` count the calls made and the ones that got a shared result.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, compute):
+        """
+        Returns compute(), or the result of the call with the same `key` already in flight
+        """
+        with self.lock:
+            self.calls += 1
+            call = self.flights.get(key)
+            leader = call is None
+            if leader:
+                call = self.flights[key] = Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error[0], call.error[1], call.error[2]
+            return call.result
+
+        try:
+            call.result = self.compute(key, compute)
+        except:
+            # djangorestframework's ErrorResponse isn't an Exception
+            call.error = sys.exc_info()
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            call.done.set()
+        return call.result
+
+    def compute(self, key, compute):
+        return compute()
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'shared': self.shared,
+        }
+
+
+class CacheSingleFlight(SingleFlight):
+    """
+    Also coalesces calls across processes, through a lock in Django's cache framework
+    (which has to be shared by the processes, e.g. memcached):
+    the process holding the lock computes the result and publishes it for `lock_timeout` seconds,
+    the others poll for it every `poll` seconds, and compute it themselves
+    if the holder fails or it takes more than `wait` seconds.
+    """
+    def __init__(self, cache_alias=None, lock_timeout=10, wait=5, poll=0.01):
+        super(CacheSingleFlight, self).__init__()
+        self.cache = get_cache(cache_alias) if cache_alias else default_cache
+        self.lock_timeout = lock_timeout
+        self.wait = wait
+        self.poll = poll
+
+    def compute(self, key, compute):
+        lock_key = 'serene:flight:%s' % key
+        flight = uuid.uuid4().hex
+        if self.cache.add(lock_key, flight, self.lock_timeout):
+            try:
+                result = compute()
+                # keyed by flight, so results of finished flights are never picked up by later ones
+                self.cache.set('%s:%s' % (lock_key, flight), (result,), self.lock_timeout)
+                return result
+            finally:
+                self.cache.delete(lock_key)
+
+        flight = self.cache.get(lock_key)
+        deadline = time.time() + self.wait
+        while flight is not None and time.time() < deadline:
+            shared = self.cache.get('%s:%s' % (lock_key, flight))
+            if shared is not None:
+                with self.lock:
+                    self.shared += 1
+                return shared[0]
+            if self.cache.get(lock_key) != flight:
+                # the holder failed, or its result has already expired
+                break
+            time.sleep(self.poll)
+        return compute()
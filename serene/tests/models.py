@@ -3,6 +3,18 @@ from serene import models
 class DummyModel(models.Model):
     name = models.CharField(max_length=1024)
 
+    record_tombstones = True
+
+    def __unicode__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return '/dummies/%s' % self.id
+
+class DummyRelatedModel(models.Model):
+    name = models.CharField(max_length=1024)
+    dummy = models.ForeignKey(DummyModel)
+
     def __unicode__(self):
         return self.name
 
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db.models.signals import post_save
+from djangorestframework.tests.testcases import SettingsTestCase
+from serene.db import conflict_target, upsert
+from serene.tests.models import DummyModel, DummyRelatedModel
+
+
+class TestUpsert(SettingsTestCase):
+    def setUp(self):
+        super(TestUpsert, self).setUp()
+        installed_apps = tuple(settings.INSTALLED_APPS) + ('serene.tests',)
+        self.settings_manager.set(INSTALLED_APPS=installed_apps)
+        self.dummy = DummyModel.objects.create(name='dummy1')
+
+    def test_upsert_must_update_existing_row(self):
+        instance, created = upsert(DummyModel.objects.all(), {'pk': self.dummy.id},
+                                   {'name': 'updated'}, DummyModel(pk=self.dummy.id, name='updated'))
+
+        self.assertFalse(created)
+        self.assertEqual(instance.id, self.dummy.id)
+        self.assertEqual(DummyModel.objects.get(id=self.dummy.id).name, 'updated')
+        self.assertEqual(DummyModel.objects.count(), 1)
+
+    def test_upsert_must_insert_missing_row(self):
+        instance, created = upsert(DummyModel.objects.all(), {'pk': 999},
+                                   {'name': 'new'}, DummyModel(pk=999, name='new'))
+
+        self.assertTrue(created)
+        self.assertEqual(DummyModel.objects.get(id=999).name, 'new')
+        self.assertEqual(DummyModel.objects.count(), 2)
+
+    def test_upsert_must_send_post_save(self):
+        saved = []
+        def receiver(sender, instance, created, **kwargs):
+            saved.append((instance.pk, created))
+        post_save.connect(receiver, sender=DummyModel)
+        try:
+            upsert(DummyModel.objects.all(), {'pk': self.dummy.id}, {'name': 'updated'},
+                   DummyModel(pk=self.dummy.id, name='updated'))
+            upsert(DummyModel.objects.all(), {'pk': 999}, {'name': 'new'}, DummyModel(pk=999, name='new'))
+        finally:
+            post_save.disconnect(receiver, sender=DummyModel)
+        self.assertEqual(saved, [(self.dummy.id, False), (999, True)])
+
+    def test_conflict_target_must_be_a_single_unique_field(self):
+        self.assertEqual(conflict_target(DummyModel, {'pk': 1}), DummyModel._meta.pk)
+        self.assertEqual(conflict_target(DummyModel, {'id': 1}), DummyModel._meta.pk)
+        self.assertEqual(conflict_target(DummyModel, {'name': 'dummy1'}), None)
+        self.assertEqual(conflict_target(DummyRelatedModel, {'dummy': 1, 'name': 'x'}), None)
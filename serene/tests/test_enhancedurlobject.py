@@ -0,0 +1,20 @@
+from django.utils.unittest.case import TestCase
+from serene.enhancedurlobject import EnhancedURLObject, LinkBuilder
+
+
+class TestEnhancedURLObject(TestCase):
+
+    def test_sub_must_remove_every_given_param(self):
+        url = EnhancedURLObject.parse('http://testserver/dummies?page=2&limit=5&name=a&page=3')
+        self.assertEqual(url - ('page', 'limit'), 'http://testserver/dummies?name=a')
+        self.assertEqual(url - 'name', 'http://testserver/dummies?page=2&limit=5&page=3')
+
+
+class TestLinkBuilder(TestCase):
+
+    def test_build_must_replace_params_at_the_end_of_the_query(self):
+        links = LinkBuilder('http://testserver/dummies?page=2&name=a&limit=5')
+        self.assertEqual(links.uri, 'http://testserver/dummies?page=2&name=a&limit=5')
+        self.assertEqual(links.build([('page', 3), ('limit', 10)]), 'http://testserver/dummies?name=a&page=3&limit=10')
+        self.assertEqual(links.build(remove=['page']), 'http://testserver/dummies?name=a&limit=5')
+        self.assertEqual(links.build(), 'http://testserver/dummies?page=2&name=a&limit=5')
@@ -1,13 +1,23 @@
+import zlib
+
 from django.conf import settings
+from django.db.models.signals import post_save
 from django.test.client import RequestFactory
 from django.utils import simplejson as json
 from django.utils.unittest.case import TestCase
 from djangorestframework.response import ErrorResponse
 from djangorestframework.tests.testcases import SettingsTestCase
 from djangorestframework.views import View
+from serene.cache import ResponseCache
+from serene.models import Tombstone
 from serene.mixins import ReadModelMixin, UpdateModelMixin, UpdateOrCreateModelMixin, CreateModelMixin, PaginatorMixin
 from serene.resources import ModelResource
-from serene.tests.models import DummyModel
+from serene.signals import request_timed
+from serene.singleflight import SingleFlight
+from serene.tests.models import DummyModel, DummyRelatedModel
+from serene.enhancedurlobject import EnhancedURLObject
+from serene.utils import encode_cursor
+from serene.views import CreatableInstanceModelView, InstanceModelView, ListOrCreateModelView, PaginatedListOrCreateModelView
 
 class TestMixinsBase(SettingsTestCase):
     def setUp(self):
@@ -33,6 +43,50 @@ class TestReadMixin(TestMixinsBase):
         self.assertTrue(response.headers.has_key('Last-Modified'))
         self.assertEqual(response.headers['Last-Modified'], dummy.last_modified)
 
+    def test_read_model_mixin_must_return_304_when_not_modified_since(self):
+        """
+        If-Modified-Since with the Last-Modified value previously sent should return 304 without content
+        """
+        dummy = DummyModel.objects.create(name='my dum dum')
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+
+        request = self.req.get('/dummies', HTTP_IF_MODIFIED_SINCE=str(dummy.last_modified))
+        mixin = ReadModelMixin()
+        mixin.resource = DummyResource
+
+        with self.assertRaises(ErrorResponse) as cm:
+            mixin.get(request, dummy.id)
+        self.assertEqual(cm.exception.response.status, 304)
+        self.assertFalse(cm.exception.response.has_content_body)
+        self.assertEqual(cm.exception.response.headers['Last-Modified'], dummy.last_modified)
+
+    def test_read_model_mixin_must_return_instance_when_modified_since(self):
+        dummy = DummyModel.objects.create(name='my dum dum')
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+
+        request = self.req.get('/dummies', HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+        mixin = ReadModelMixin()
+        mixin.resource = DummyResource
+
+        response = mixin.get(request, dummy.id)
+        self.assertEquals(dummy.name, response.cleaned_content.name)
+
+    def test_read_model_mixin_conditional_get_not_exist_model_return_404(self):
+        class DummyResource(ModelResource):
+            model = DummyModel
+
+        request = self.req.get('/dummies', HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+        mixin = ReadModelMixin()
+        mixin.resource = DummyResource
+
+        with self.assertRaises(ErrorResponse) as cm:
+            mixin.get(request, 999)
+        self.assertEqual(cm.exception.response.status, 404)
+
 class TestUpdateModelMixin(TestMixinsBase):
 
     def setUp(self):
@@ -78,6 +132,120 @@ class TestUpdateModelMixin(TestMixinsBase):
 
         self.assertRaises(ErrorResponse, self.mixin.put, request, id=999)
 
+class TestCachedReadModelMixin(TestMixinsBase):
+
+    def setUp(self):
+        super(TestCachedReadModelMixin, self).setUp()
+        self.dummy = DummyModel.objects.create(name='dummy1')
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+            fields = ('id', 'name')
+        self.cache = ResponseCache(timeout=60)
+        self.view = InstanceModelView.as_view(resource=DummyResource, response_cache=self.cache)
+
+    def test_cached_response_must_be_served_without_serializing(self):
+        response = self.view(self.req.get('/dummies/%s' % self.dummy.id), self.dummy.id)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+        with self.assertNumQueries(1):
+            cached = self.view(self.req.get('/dummies/%s' % self.dummy.id), self.dummy.id)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['Content-Type'], response['Content-Type'])
+        self.assertTrue(cached.has_header('Last-Modified'))
+
+    def test_saving_must_invalidate_cached_response(self):
+        self.view(self.req.get('/dummies/%s' % self.dummy.id), self.dummy.id)
+        self.dummy.name = 'updated'
+        self.dummy.save()
+
+        response = self.view(self.req.get('/dummies/%s' % self.dummy.id), self.dummy.id)
+        self.assertEqual(json.loads(response.content)['name'], 'updated')
+        self.assertEqual(self.cache.stats()['hits'], 0)
+
+    def test_media_types_must_be_cached_apart(self):
+        self.view(self.req.get('/dummies/%s' % self.dummy.id, HTTP_ACCEPT='application/json'), self.dummy.id)
+        response = self.view(self.req.get('/dummies/%s' % self.dummy.id, HTTP_ACCEPT='application/xml'), self.dummy.id)
+        self.assertTrue(response['Content-Type'].startswith('application/xml'))
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+class TestSingleFlightReadModelMixin(TestMixinsBase):
+
+    def setUp(self):
+        super(TestSingleFlightReadModelMixin, self).setUp()
+        self.dummy = DummyModel.objects.create(name='dummy1')
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+            fields = ('id', 'name')
+        self.flight = SingleFlight()
+        self.view = InstanceModelView.as_view(resource=DummyResource)
+        self.coalesced_view = InstanceModelView.as_view(resource=DummyResource, single_flight=self.flight)
+
+    def test_coalesced_response_must_match_plain_one(self):
+        response = self.view(self.req.get('/dummies/%s' % self.dummy.id), self.dummy.id)
+        coalesced = self.coalesced_view(self.req.get('/dummies/%s' % self.dummy.id), self.dummy.id)
+
+        self.assertEqual(coalesced.status_code, 200)
+        self.assertEqual(coalesced.content, response.content)
+        self.assertEqual(coalesced['Content-Type'], response['Content-Type'])
+        self.assertEqual(coalesced['ETag'], response['ETag'])
+        self.assertEqual(self.flight.stats()['calls'], 1)
+
+    def test_missing_instance_must_return_404(self):
+        response = self.coalesced_view(self.req.get('/dummies/999'), 999)
+        self.assertEqual(response.status_code, 404)
+
+class TestPartialUpdateModelMixin(TestMixinsBase):
+
+    def setUp(self):
+        super(TestPartialUpdateModelMixin, self).setUp()
+        self.dummy = DummyModel.objects.create(name='dummy1')
+        self.related = DummyRelatedModel.objects.create(name='related1', dummy=self.dummy)
+
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+        self.view = InstanceModelView.as_view(resource=RelatedResource, partial_update=True)
+
+    def _put(self, id, data):
+        return self.view(self.req.put('/related/%s' % id, json.dumps(data), content_type='application/json'), id=id)
+
+    def test_partial_update_must_write_sent_columns(self):
+        response = self._put(self.related.id, {'name': 'updated_name', 'dummy': self.dummy.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['name'], 'updated_name')
+
+        related = DummyRelatedModel.objects.get(id=self.related.id)
+        self.assertEqual(related.name, 'updated_name')
+        self.assertTrue(related.last_modified > self.related.last_modified)
+
+    def test_partial_update_not_exist_model_return_404(self):
+        response = self._put(999, {'name': 'updated_name', 'dummy': self.dummy.id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_partial_update_must_only_validate_sent_columns(self):
+        response = self._put(self.related.id, {'name': 'updated_name'})
+        self.assertEqual(response.status_code, 200)
+        related = DummyRelatedModel.objects.get(id=self.related.id)
+        self.assertEqual((related.name, related.dummy_id), ('updated_name', self.dummy.id))
+
+        response = self._put(self.related.id, {'dummy': 999})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['field_errors'].keys(), ['dummy'])
+
+    def test_partial_update_must_send_post_save(self):
+        saved = []
+        def receiver(sender, instance, created, **kwargs):
+            saved.append((instance.pk, created))
+        post_save.connect(receiver, sender=DummyRelatedModel)
+        try:
+            self._put(self.related.id, {'name': 'updated_name'})
+        finally:
+            post_save.disconnect(receiver, sender=DummyRelatedModel)
+        self.assertEqual(saved, [(self.related.id, False)])
+
 class TestUpdateOrCreateModelMixin(TestMixinsBase):
 
     def setUp(self):
@@ -130,6 +298,62 @@ class TestUpdateOrCreateModelMixin(TestMixinsBase):
         self.assertEqual(new_dummy.name, 'new_dummy')
         self.assertEqual(DummyModel.objects.count(), 2)
 
+class TestConditionalUpdate(TestMixinsBase):
+
+    def setUp(self):
+        super(TestConditionalUpdate, self).setUp()
+        self.dummy = DummyModel.objects.create(name='dummy1')
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+        self.view = InstanceModelView.as_view(resource=DummyResource)
+        self.partial_view = InstanceModelView.as_view(resource=DummyResource, partial_update=True)
+        self.upsert_view = CreatableInstanceModelView.as_view(resource=DummyResource)
+
+    def _put(self, view, id, data, **headers):
+        request = self.req.put('/dummies/%s' % id, json.dumps(data), content_type='application/json', **headers)
+        return view(request, id=id)
+
+    def test_put_must_apply_when_etag_matches(self):
+        etag = self.view(self.req.get('/dummies/%s' % self.dummy.id), id=self.dummy.id)['ETag']
+        for view in (self.view, self.partial_view, self.upsert_view):
+            response = self._put(view, self.dummy.id, {'name': 'updated'}, HTTP_IF_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = self.view(self.req.get('/dummies/%s' % self.dummy.id), id=self.dummy.id)['ETag']
+        self.assertEqual(DummyModel.objects.get(id=self.dummy.id).name, 'updated')
+
+    def test_put_must_fail_when_row_changed(self):
+        etag = self.view(self.req.get('/dummies/%s' % self.dummy.id), id=self.dummy.id)['ETag']
+        since = self.dummy.last_modified.isoformat()
+        self.dummy.name = 'concurrent'
+        self.dummy.save()
+
+        for view in (self.view, self.partial_view, self.upsert_view):
+            response = self._put(view, self.dummy.id, {'name': 'lost'}, HTTP_IF_MATCH=etag)
+            self.assertEqual(response.status_code, 412)
+            response = self._put(view, self.dummy.id, {'name': 'lost'}, HTTP_IF_UNMODIFIED_SINCE=since)
+            self.assertEqual(response.status_code, 412)
+        self.assertEqual(DummyModel.objects.get(id=self.dummy.id).name, 'concurrent')
+
+    def test_conditional_put_must_send_post_save(self):
+        saved = []
+        def receiver(sender, instance, created, **kwargs):
+            saved.append((instance.pk, created))
+        post_save.connect(receiver, sender=DummyModel)
+        try:
+            for view in (self.view, self.upsert_view):
+                self._put(view, self.dummy.id, {'name': 'updated'}, HTTP_IF_MATCH='*')
+        finally:
+            post_save.disconnect(receiver, sender=DummyModel)
+        self.assertEqual(saved, [(self.dummy.id, False)] * 2)
+
+    def test_put_with_precondition_must_not_create(self):
+        response = self._put(self.view, 999, {'name': 'new'}, HTTP_IF_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+        response = self._put(self.upsert_view, 999, {'name': 'new'}, HTTP_IF_MATCH='*')
+        self.assertEqual(response.status_code, 412)
+        self.assertFalse(DummyModel.objects.filter(id=999).exists())
+
 class TestCreateModelMixin(TestMixinsBase):
 
     def setUp(self):
@@ -161,6 +385,151 @@ class TestCreateModelMixin(TestMixinsBase):
         self.assertTrue(response.headers.has_key('Content-Location'))
         self.assertEqual(response.headers['Content-Location'], '/dummy/2')
 
+class TestBulkCreateModelMixin(TestMixinsBase):
+
+    def setUp(self):
+        super(TestBulkCreateModelMixin, self).setUp()
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+
+            def url(self, instance):
+                return '/dummy/%s' % instance.id
+        self.view = ListOrCreateModelView.as_view(resource=DummyResource)
+
+    def test_post_array_must_create_every_item(self):
+        data = json.dumps([{'name': 'dummy1'}, {'name': 'dummy2'}, {'name': 'dummy3'}])
+        response = self.view(self.req.post('/dummies', data=data, content_type='application/json'))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(DummyModel.objects.count(), 3)
+        ids = DummyModel.objects.order_by('id').values_list('id', flat=True)
+        self.assertEqual(json.loads(response.content),
+                         [{'status': 201, 'location': '/dummy/%s' % id} for id in ids])
+
+    def test_post_array_must_create_nothing_when_an_item_is_invalid(self):
+        data = json.dumps([{'name': 'dummy1'}, {}])
+        response = self.view(self.req.post('/dummies', data=data, content_type='application/json'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(DummyModel.objects.count(), 0)
+        content = json.loads(response.content)
+        self.assertEqual(content[0], None)
+        self.assertEqual(content[1]['status'], 400)
+        self.assertTrue('name' in content[1]['errors']['field_errors'])
+
+    def test_post_array_must_reject_items_that_are_not_objects(self):
+        data = json.dumps([{'name': 'dummy1'}, 1, 'x'])
+        response = self.view(self.req.post('/dummies', data=data, content_type='application/json'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(DummyModel.objects.count(), 0)
+        content = json.loads(response.content)
+        self.assertEqual(content[0], None)
+        self.assertEqual([item['status'] for item in content[1:]], [400, 400])
+
+class TestListModelMixin(TestMixinsBase):
+
+    def setUp(self):
+        super(TestListModelMixin, self).setUp()
+        DummyModel.objects.create(name='dummy1')
+        DummyModel.objects.create(name='dummy2')
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+        self.resource = DummyResource
+        self.view = ListOrCreateModelView.as_view(resource=DummyResource, collection_etag=True)
+
+    def test_list_must_return_etag_header(self):
+        response = self.view(self.req.get('/dummies'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+    def test_list_etag_must_be_opt_in(self):
+        view = ListOrCreateModelView.as_view(resource=self.resource)
+        with self.assertNumQueries(1):
+            response = view(self.req.get('/dummies'))
+        self.assertFalse(response.has_header('ETag'))
+
+        view = PaginatedListOrCreateModelView.as_view(resource=self.resource, collection_etag=True,
+                                                      cursor_pagination=True, limit=1)
+        with self.assertNumQueries(1):
+            response = view(self.req.get('/dummies'))
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_list_must_return_304_when_etag_matches(self):
+        etag = self.view(self.req.get('/dummies'))['ETag']
+
+        response = self.view(self.req.get('/dummies', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, '')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_list_etag_must_change_with_collection_and_params(self):
+        etag = self.view(self.req.get('/dummies'))['ETag']
+        self.assertNotEqual(etag, self.view(self.req.get('/dummies?page=2'))['ETag'])
+
+        DummyModel.objects.create(name='dummy3')
+        response = self.view(self.req.get('/dummies', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_must_stream_json_when_enabled(self):
+        class DummyResource(ModelResource):
+            model = DummyModel
+
+            def url(self, instance):
+                return '/dummies/%s' % instance.id
+        view = ListOrCreateModelView.as_view(resource=DummyResource)
+        streaming_view = ListOrCreateModelView.as_view(resource=DummyResource, stream=True, stream_chunk_size=1,
+                                                       collection_etag=True)
+
+        response = streaming_view(self.req.get('/dummies', HTTP_ACCEPT='application/json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response._is_string)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertEqual(json.loads(response.content),
+                         json.loads(view(self.req.get('/dummies', HTTP_ACCEPT='application/json')).content))
+
+    def test_list_must_stream_empty_json_list(self):
+        DummyModel.objects.all().delete()
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+        view = ListOrCreateModelView.as_view(resource=DummyResource, stream=True)
+        response = view(self.req.get('/dummies', HTTP_ACCEPT='application/json'))
+        self.assertEqual(response.content, '[]')
+
+
+class TestBatchListModelMixin(TestMixinsBase):
+
+    def setUp(self):
+        super(TestBatchListModelMixin, self).setUp()
+        self.dummies = [DummyModel.objects.create(name='dummy%s' % i) for i in range(3)]
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+            fields = ('id', 'name')
+        self.view = PaginatedListOrCreateModelView.as_view(resource=DummyResource, limit=1, max_batch_ids=3)
+
+    def test_batch_must_return_requested_order_with_missing_markers(self):
+        ids = [self.dummies[2].id, 999, self.dummies[0].id]
+        with self.assertNumQueries(1):
+            response = self.view(self.req.get('/dummies', {'ids': '%s,%s,%s,%s' % tuple(ids + ids[:1])}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['results'], [
+            {'id': self.dummies[2].id, 'name': 'dummy2'},
+            {'id': 999, 'status': 404},
+            {'id': self.dummies[0].id, 'name': 'dummy0'},
+        ])
+
+    def test_batch_must_be_capped_and_validated(self):
+        response = self.view(self.req.get('/dummies', {'ids': '1,2,3,4'}))
+        self.assertEqual(response.status_code, 400)
+        response = self.view(self.req.get('/dummies', {'ids': '1,two'}))
+        self.assertEqual(response.status_code, 400)
 
 class MockPaginatorView(PaginatorMixin, View):
     total = 60
@@ -280,3 +649,248 @@ class TestPaginatorMixin(TestCase):
         #assert last
         self.assertTrue(links.has_key('last'))
         self._assert_links(links, 'last', 'http://testserver/paginator')
+
+
+class TestChangeFeed(TestMixinsBase):
+
+    def setUp(self):
+        super(TestChangeFeed, self).setUp()
+        self.dummies = [DummyModel.objects.create(name='dummy%s' % i) for i in range(3)]
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+            fields = ('id', 'name')
+        self.view = PaginatedListOrCreateModelView.as_view(resource=DummyResource, changes_limit=2)
+
+    def _get(self, since):
+        response = self.view(self.req.get('/dummies', {'since': since}))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_since_timestamp_must_return_changes_in_order(self):
+        content = self._get('2000-01-01 00:00:00')
+        self.assertEqual(content['changes'], [{'id': 1, 'name': 'dummy0'}, {'id': 2, 'name': 'dummy1'}])
+        self.assertTrue(content['more'])
+
+        content = self._get(content['since'])
+        self.assertEqual(content['changes'], [{'id': 3, 'name': 'dummy2'}])
+        self.assertFalse(content['more'])
+
+        content = self._get(content['since'])
+        self.assertEqual(content['changes'], [])
+        self.assertEqual(content['deleted'], [])
+
+    def test_since_cursor_must_return_updates_and_deletions(self):
+        since = self._get('2000-01-01 00:00:00')['since']
+        since = self._get(since)['since']
+
+        self.dummies[0].name = 'updated'
+        self.dummies[0].save()
+        self.dummies[1].delete()
+
+        content = self._get(since)
+        self.assertEqual(content['changes'], [{'id': 1, 'name': 'updated'}])
+        self.assertEqual([deleted['id'] for deleted in content['deleted']], [2])
+
+    def test_invalid_since_must_be_rejected(self):
+        response = self.view(self.req.get('/dummies', {'since': 'yesterday'}))
+        self.assertEqual(response.status_code, 400)
+
+        for values in (['x', 1, 'y', 2], ['2012-01-01 00:00:00', 1]):
+            response = self.view(self.req.get('/dummies', {'since': encode_cursor('next', values)}))
+            self.assertEqual(response.status_code, 400)
+
+    def test_tombstones_must_be_opt_in(self):
+        related = DummyRelatedModel.objects.create(name='related', dummy=self.dummies[2])
+        related.delete()
+        self.assertEqual(Tombstone.objects.count(), 0)
+        self.dummies[2].delete()
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+class TestCursorPaginatorMixin(TestMixinsBase):
+
+    def setUp(self):
+        super(TestCursorPaginatorMixin, self).setUp()
+        for i in range(5):
+            DummyModel.objects.create(name='dummy%s' % i)
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+        self.view = PaginatedListOrCreateModelView.as_view(resource=DummyResource, cursor_pagination=True, limit=2)
+
+    def _get(self, href):
+        response = self.view(self.req.get(href))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def _names(self, content):
+        return [result['name'] for result in content['results']]
+
+    def test_cursor_pagination_must_walk_forward_and_back(self):
+        content = self._get('/dummies')
+        self.assertEqual(self._names(content), ['dummy0', 'dummy1'])
+        self.assertFalse(content['links'].has_key('previous'))
+        self.assertFalse(content.has_key('total'))
+        self.assertTrue('cursor=' in content['links']['next']['href'])
+
+        content = self._get(content['links']['next']['href'])
+        self.assertEqual(self._names(content), ['dummy2', 'dummy3'])
+
+        content = self._get(content['links']['next']['href'])
+        self.assertEqual(self._names(content), ['dummy4'])
+        self.assertFalse(content['links'].has_key('next'))
+
+        content = self._get(content['links']['previous']['href'])
+        self.assertEqual(self._names(content), ['dummy2', 'dummy3'])
+
+        content = self._get(content['links']['previous']['href'])
+        self.assertEqual(self._names(content), ['dummy0', 'dummy1'])
+        self.assertFalse(content['links'].has_key('previous'))
+        self._assert_first_link(content)
+
+    def _assert_first_link(self, content):
+        first = EnhancedURLObject.parse(content['links']['first']['href'])
+        self.assertFalse('cursor' in first.query_dict())
+
+    def test_cursor_pagination_invalid_cursor_return_404(self):
+        response = self.view(self.req.get('/dummies?cursor=garbage'))
+        self.assertEqual(response.status_code, 404)
+
+        for values in (['notadate', 'x'], ['2012-01-01 00:00:00']):
+            response = self.view(self.req.get('/dummies', {'cursor': encode_cursor('next', values)}))
+            self.assertEqual(response.status_code, 404)
+
+
+class TestTimingMixin(TestMixinsBase):
+
+    def setUp(self):
+        super(TestTimingMixin, self).setUp()
+        for i in range(3):
+            DummyModel.objects.create(name='dummy%s' % i)
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+        self.resource = DummyResource
+        self.view = PaginatedListOrCreateModelView.as_view(resource=DummyResource, timing=True, limit=2)
+
+    def test_timed_view_must_return_server_timing_header(self):
+        response = self.view(self.req.get('/dummies'))
+        metrics = dict(metric.split(';')[0:2] for metric in response['Server-Timing'].split(', '))
+        self.assertEqual(sorted(metrics), ['db', 'links', 'render', 'serialize', 'total', 'view'])
+        # the count and the page
+        self.assertTrue(';desc="2 queries"' in response['Server-Timing'])
+
+    def test_timed_view_must_send_timings(self):
+        reports = []
+        def receiver(sender, request, response, timings, **kwargs):
+            reports.append(timings.as_dict())
+        request_timed.connect(receiver)
+        try:
+            self.view(self.req.get('/dummies'))
+        finally:
+            request_timed.disconnect(receiver)
+
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]['queries'], 2)
+        self.assertAlmostEqual(reports[0]['total'], sum(duration for name, duration in reports[0].items()
+                                                        if name not in ('total', 'queries')))
+
+    def test_untimed_view_must_not_return_server_timing_header(self):
+        response = PaginatedListOrCreateModelView.as_view(resource=self.resource)(self.req.get('/dummies'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class TestCompressionMixin(TestMixinsBase):
+
+    def setUp(self):
+        super(TestCompressionMixin, self).setUp()
+        for i in range(50):
+            DummyModel.objects.create(name='dummy%s' % i)
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+        self.resource = DummyResource
+
+    def _decompress(self, content):
+        return json.loads(zlib.decompress(content, 16 + zlib.MAX_WBITS))
+
+    def test_large_response_must_be_gzipped(self):
+        view = ListOrCreateModelView.as_view(resource=self.resource, compress=True, collection_etag=True)
+        response = view(self.req.get('/dummies', HTTP_ACCEPT_ENCODING='deflate, gzip;q=0.5'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue('Accept-Encoding' in response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual(len(self._decompress(response.content)), 50)
+
+    def test_streamed_response_must_be_gzipped(self):
+        view = ListOrCreateModelView.as_view(resource=self.resource, compress=True, stream=True, stream_chunk_size=10)
+        response = view(self.req.get('/dummies', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(self._decompress(''.join(response))), 50)
+
+    def test_small_or_unaccepted_response_must_not_be_gzipped(self):
+        view = ListOrCreateModelView.as_view(resource=self.resource, compress=True, compress_min_length=1000000)
+        response = view(self.req.get('/dummies', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(json.loads(response.content)), 50)
+
+        view = ListOrCreateModelView.as_view(resource=self.resource, compress=True)
+        response = view(self.req.get('/dummies', HTTP_ACCEPT_ENCODING='gzip;q=0, identity'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class TestReplicaRouting(TestMixinsBase):
+
+    def setUp(self):
+        super(TestReplicaRouting, self).setUp()
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+
+            def url(self, instance):
+                return '/dummies/%s' % instance.id
+        self.resource = DummyResource
+
+    def _view(self, request):
+        view = ListOrCreateModelView(resource=self.resource, read_databases=['replica'])
+        view.request = request
+        return view
+
+    def test_reads_must_go_to_replicas_and_writes_to_primary(self):
+        self.assertEqual(self._view(self.req.get('/dummies')).get_queryset().db, 'replica')
+        self.assertEqual(self._view(self.req.post('/dummies')).get_queryset().db, 'default')
+        self.assertEqual(self._view(self.req.put('/dummies/1')).get_queryset().db, 'default')
+
+    def test_request_must_read_from_a_single_replica(self):
+        view = ListOrCreateModelView(resource=self.resource, read_databases=['replica', 'other'])
+        view.request = self.req.get('/dummies')
+        databases = set(view.get_queryset().db for i in range(20))
+        self.assertEqual(len(databases), 1)
+
+    def test_reads_must_stick_to_primary_after_writes(self):
+        view = ListOrCreateModelView.as_view(resource=self.resource, read_databases=['replica'])
+        response = view(self.req.post('/dummies', data={'name': 'new'}))
+        self.assertEqual(response.status_code, 201)
+        until = response.cookies['serene_primary_until'].value
+        self.assertEqual(response['X-Serene-Primary-Until'], until)
+
+        request = self.req.get('/dummies')
+        request.COOKIES['serene_primary_until'] = until
+        self.assertEqual(self._view(request).get_queryset().db, 'default')
+
+        request = self.req.get('/dummies', HTTP_X_SERENE_PRIMARY_UNTIL=until)
+        self.assertEqual(self._view(request).get_queryset().db, 'default')
+
+        request = self.req.get('/dummies', HTTP_X_SERENE_PRIMARY_UNTIL='1')
+        self.assertEqual(self._view(request).get_queryset().db, 'replica')
+
+    def test_writes_must_not_stick_without_replicas(self):
+        view = ListOrCreateModelView.as_view(resource=self.resource, read_databases=[])
+        response = view(self.req.post('/dummies', data={'name': 'new'}))
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse('serene_primary_until' in response.cookies)
+        self.assertFalse(response.has_header('X-Serene-Primary-Until'))
+
+        view = ListOrCreateModelView.as_view(resource=self.resource)
+        response = view(self.req.post('/dummies', data={'name': 'other'}))
+        self.assertFalse('serene_primary_until' in response.cookies)
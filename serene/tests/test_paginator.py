@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.test.client import RequestFactory
+from django.utils import simplejson as json
+from djangorestframework.tests.testcases import SettingsTestCase
+from djangorestframework.views import View
+from serene.mixins import PaginatorMixin
+from serene.paginator import CachedCount, EstimatedCount, ExactCount, Paginator
+from serene.tests.models import DummyModel
+
+
+class TestCountStrategies(SettingsTestCase):
+    def setUp(self):
+        super(TestCountStrategies, self).setUp()
+        installed_apps = tuple(settings.INSTALLED_APPS) + ('serene.tests',)
+        self.settings_manager.set(INSTALLED_APPS=installed_apps)
+        DummyModel.objects.create(name='dummy1')
+        DummyModel.objects.create(name='dummy2')
+
+    def test_exact_count(self):
+        self.assertEqual(ExactCount().count(DummyModel.objects.all()), (2, False))
+        self.assertEqual(ExactCount().count(range(5)), (5, False))
+
+    def test_cached_count_must_be_reused_until_model_changes(self):
+        strategy = CachedCount(timeout=60)
+        self.assertEqual(strategy.count(DummyModel.objects.all()), (2, False))
+
+        self.assertNumQueries(0, strategy.count, DummyModel.objects.all())
+        self.assertEqual(strategy.count(DummyModel.objects.filter(name='dummy1')), (1, False))
+
+        DummyModel.objects.create(name='dummy3')
+        self.assertEqual(strategy.count(DummyModel.objects.all()), (3, False))
+
+        DummyModel.objects.get(name='dummy1').delete()
+        self.assertEqual(strategy.count(DummyModel.objects.all()), (2, False))
+
+    def test_cached_count_must_be_dropped_by_changes_made_before_counting(self):
+        # another process counts, this one only saves
+        counting, saving = CachedCount(timeout=60), CachedCount(timeout=60)
+        self.assertEqual(counting.count(DummyModel.objects.all()), (2, False))
+        post_save.disconnect(dispatch_uid='serene.cache.Versions.%s' % id(counting.generations))
+        try:
+            DummyModel.objects.create(name='dummy3')
+        finally:
+            post_save.connect(counting.generations.bump, weak=False,
+                              dispatch_uid='serene.cache.Versions.%s' % id(counting.generations))
+        self.assertEqual(counting.count(DummyModel.objects.all()), (3, False))
+
+    def test_cached_count_must_key_on_the_query_parameters(self):
+        DummyModel.objects.create(name=u'caf\xe9')
+        strategy = CachedCount(timeout=60)
+        self.assertEqual(strategy.count(DummyModel.objects.filter(name=u'caf\xe9')), (1, False))
+        self.assertEqual(strategy.count(DummyModel.objects.filter(name=u'cafe')), (0, False))
+        self.assertEqual(strategy.count(DummyModel.objects.filter(pk__in=[])), (0, False))
+
+    def test_estimated_count_must_fall_back_to_exact_count(self):
+        # sqlite keeps no row estimates
+        self.assertEqual(EstimatedCount(threshold=0).count(DummyModel.objects.all()), (2, False))
+
+
+class MockEstimate(object):
+    def count(self, object_list):
+        return 100, True
+
+
+class MockEstimatedPaginatorView(PaginatorMixin, View):
+    count_strategy = MockEstimate()
+
+    def get(self, request):
+        return range(0, 60)
+
+
+class TestPaginatorCountStrategy(SettingsTestCase):
+
+    def test_estimated_total_must_be_marked_approximate(self):
+        request = RequestFactory().get('/paginator')
+        response = MockEstimatedPaginatorView.as_view(limit=10)(request)
+        content = json.loads(response.content)
+
+        self.assertEqual(content['total'], 100)
+        self.assertEqual(content['pages'], 10)
+        self.assertTrue(content['approximate'])
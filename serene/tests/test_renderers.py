@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.test.client import RequestFactory
+from django.utils import simplejson as json
+from django.utils.unittest.case import skipIf
+from djangorestframework.tests.testcases import SettingsTestCase
+from serene.compat import msgpack
+from serene.renderers import FAST_RENDERERS, MessagePackRenderer
+from serene.resources import ModelResource
+from serene.tests.models import DummyModel
+from serene.views import ListOrCreateModelView
+
+
+class TestFastRenderers(SettingsTestCase):
+    def setUp(self):
+        super(TestFastRenderers, self).setUp()
+        installed_apps = tuple(settings.INSTALLED_APPS) + ('serene.tests',)
+        self.settings_manager.set(INSTALLED_APPS=installed_apps)
+        DummyModel.objects.create(name='dummy1')
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+            fields = ('id', 'name', 'last_modified')
+        self.view = ListOrCreateModelView.as_view(resource=DummyResource, renderers=FAST_RENDERERS)
+
+    def test_views_must_negotiate_json(self):
+        response = self.view(RequestFactory().get('/dummies', HTTP_ACCEPT='application/json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)[0]['name'], 'dummy1')
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_views_must_negotiate_msgpack(self):
+        response = self.view(RequestFactory().get('/dummies', HTTP_ACCEPT='application/msgpack'))
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        rendered = msgpack.unpackb(response.content, raw=False)
+        self.assertEqual(rendered[0]['name'], 'dummy1')
+        # no bin typed (0xc4) keys for clients to trip on
+        self.assertFalse('\xc4\x04name' in response.content)
+        self.assertEqual(MessagePackRenderer.format, 'msgpack')
@@ -0,0 +1,261 @@
+import warnings
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test.client import RequestFactory
+from django.utils import simplejson as json
+from djangorestframework.tests.testcases import SettingsTestCase
+from serene.resources import ModelResource
+from serene.tests.models import DummyModel, DummyRelatedModel
+from serene.views import InstanceModelView, ListOrCreateModelView, PaginatedListOrCreateModelView
+
+
+class TestResourcesBase(SettingsTestCase):
+    def setUp(self):
+        super(TestResourcesBase, self).setUp()
+        installed_apps = tuple(settings.INSTALLED_APPS) + ('serene.tests',)
+        self.settings_manager.set(INSTALLED_APPS=installed_apps)
+        self.req = RequestFactory()
+
+
+class TestRelatedFields(TestResourcesBase):
+
+    def test_related_fields_must_follow_serialized_fields(self):
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+
+        class NameOnlyResource(ModelResource):
+            model = DummyRelatedModel
+            fields = ('name',)
+
+        class OverriddenResource(ModelResource):
+            model = DummyRelatedModel
+            select_related = ()
+
+        self.assertEqual(RelatedResource.get_related_fields(), (('dummy',), ()))
+        self.assertEqual(NameOnlyResource.get_related_fields(), ((), ()))
+        self.assertEqual(OverriddenResource.get_related_fields(), ((), ()))
+
+    def test_list_must_load_related_objects_in_one_query(self):
+        for i in range(3):
+            dummy = DummyModel.objects.create(name='dummy%s' % i)
+            DummyRelatedModel.objects.create(name='related%s' % i, dummy=dummy)
+
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+        view = ListOrCreateModelView.as_view(resource=RelatedResource)
+
+        with self.assertNumQueries(1):
+            response = view(self.req.get('/related'))
+        content = json.loads(response.content)
+        self.assertEqual(len(content), 3)
+        self.assertEqual(content[0]['dummy']['links']['self']['href'], '/dummies/1')
+
+
+class TestSerializationPlan(TestResourcesBase):
+
+    def test_serialization_plan_must_be_compiled_once(self):
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+
+        plan = RelatedResource.get_serialization_plan(DummyRelatedModel)
+        self.assertTrue(plan is RelatedResource.get_serialization_plan(DummyRelatedModel))
+        self.assertEqual([name for name, attribute, key, kind in plan],
+                         ['id', 'last_modified', 'name', 'dummy', 'links'])
+
+    def test_serialize_must_follow_plan(self):
+        dummy = DummyModel.objects.create(name='dummy')
+        related = DummyRelatedModel.objects.create(name='related', dummy=dummy)
+
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+
+            def url(self, instance):
+                return '/related/%s' % instance.id
+
+        content = RelatedResource().filter_response([related, related])
+        self.assertEqual(content[0], {
+            'id': related.id,
+            'last_modified': related.last_modified,
+            'name': u'related',
+            'dummy': {
+                'id': dummy.id,
+                'title': u'dummy',
+                'links': {'self': {'href': '/dummies/1', 'rel': 'self'}},
+            },
+            'links': {
+                'self': {'href': '/related/1', 'rel': 'self'},
+                'dummy': {'href': '/dummies/1', 'rel': 'dummy', 'title': u'dummy'},
+            },
+        })
+        self.assertEqual(content[1], content[0])
+
+    def test_serialize_must_go_through_overridden_hooks(self):
+        dummy = DummyModel.objects.create(name='dummy')
+
+        class ShoutingResource(ModelResource):
+            model = DummyModel
+            fields = ('id', 'name')
+
+            def serialize_key(self, key):
+                return key.upper()
+
+            def serialize_val(self, key, obj):
+                value = super(ShoutingResource, self).serialize_val(key, obj)
+                return value.upper() if isinstance(value, basestring) else value
+
+        self.assertEqual(ShoutingResource().serialize(dummy), {'ID': dummy.id, 'NAME': u'DUMMY'})
+
+
+class TestSparseFieldsets(TestResourcesBase):
+
+    def setUp(self):
+        super(TestSparseFieldsets, self).setUp()
+        for i in range(3):
+            dummy = DummyModel.objects.create(name='dummy%s' % i)
+            DummyRelatedModel.objects.create(name='related%s' % i, dummy=dummy)
+
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+        self.view = ListOrCreateModelView.as_view(resource=RelatedResource)
+
+    def test_fields_must_narrow_serialized_keys(self):
+        content = json.loads(self.view(self.req.get('/related?fields=id,name')).content)
+        self.assertEqual(content[0], {'id': 1, 'name': 'related0'})
+
+    def test_blank_fields_must_be_ignored(self):
+        content = json.loads(self.view(self.req.get('/related?fields=id,,name,')).content)
+        self.assertEqual(content[0], {'id': 1, 'name': 'related0'})
+
+    def test_fields_must_narrow_related_objects(self):
+        content = json.loads(self.view(self.req.get('/related?fields=name,dummy.title')).content)
+        self.assertEqual(content[0], {'name': 'related0', 'dummy': {'title': 'dummy0'}})
+
+    def test_fields_must_narrow_loaded_columns(self):
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+        resource = RelatedResource(ListOrCreateModelView(request=self.req.get('/related?fields=name')))
+        queryset = resource.prepare_queryset(DummyRelatedModel.objects.all())
+        self.assertEqual(str(queryset.query).split(' FROM ')[0],
+                         'SELECT "tests_dummyrelatedmodel"."id", "tests_dummyrelatedmodel"."last_modified", '
+                         '"tests_dummyrelatedmodel"."name"')
+
+    def test_narrowed_columns_must_include_the_views_own_reads(self):
+        for i in range(3, 10):
+            DummyRelatedModel.objects.create(name='related%s' % i, dummy=DummyModel.objects.get(id=1))
+
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+            fields = ('id', 'name')
+        view = PaginatedListOrCreateModelView.as_view(resource=RelatedResource, changes_limit=10)
+        with self.assertNumQueries(3):
+            response = view(self.req.get('/related', {'since': '2000-01-01 00:00:00', 'fields': 'name'}))
+        self.assertEqual(len(json.loads(response.content)['changes']), 10)
+
+        view = InstanceModelView.as_view(resource=RelatedResource)
+        with self.assertNumQueries(1):
+            response = view(self.req.get('/related/1', {'fields': 'name'}), id=1)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        view = PaginatedListOrCreateModelView.as_view(resource=RelatedResource, cursor_pagination=True, limit=5)
+        with self.assertNumQueries(1):
+            response = view(self.req.get('/related', {'fields': 'name'}))
+        self.assertTrue('next' in json.loads(response.content)['links'])
+
+    def test_unknown_fields_must_be_rejected(self):
+        response = self.view(self.req.get('/related?fields=name,secret'))
+        self.assertEqual(response.status_code, 400)
+        response = self.view(self.req.get('/related?fields=dummy.secret'))
+        self.assertEqual(response.status_code, 400)
+
+
+class TestExpansion(TestResourcesBase):
+
+    def setUp(self):
+        super(TestExpansion, self).setUp()
+        for i in range(3):
+            dummy = DummyModel.objects.create(name='dummy%s' % i)
+            DummyRelatedModel.objects.create(name='related%s' % i, dummy=dummy)
+
+        class DummyResource(ModelResource):
+            model = DummyModel
+            fields = ('id', 'name')
+
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+            fields = ('id', 'name', 'dummy')
+            expand = {'dummy': DummyResource}
+        self.resource = RelatedResource
+        self.view = ListOrCreateModelView.as_view(resource=RelatedResource)
+
+    def test_expand_must_embed_related_resource(self):
+        with self.assertNumQueries(1):
+            response = self.view(self.req.get('/related?expand=dummy'))
+        content = json.loads(response.content)
+        self.assertEqual(content[0], {'id': 1, 'name': 'related0', 'dummy': {'id': 1, 'name': 'dummy0'}})
+
+    def test_expand_must_be_loaded_with_related_paths(self):
+        resource = self.resource(ListOrCreateModelView(request=self.req.get('/related?expand=dummy')))
+        self.assertEqual(resource.get_expanded_paths(), (['dummy'], []))
+
+    def test_blank_expansions_must_be_ignored(self):
+        content = json.loads(self.view(self.req.get('/related?expand=dummy,')).content)
+        self.assertEqual(content[0]['dummy'], {'id': 1, 'name': 'dummy0'})
+        self.assertEqual(self.view(self.req.get('/related?expand= , ')).status_code, 200)
+
+    def test_unknown_or_deep_expansions_must_be_rejected(self):
+        self.assertEqual(self.view(self.req.get('/related?expand=name')).status_code, 400)
+        self.assertEqual(self.view(self.req.get('/related?expand=dummy.name')).status_code, 400)
+        self.assertEqual(self.view(self.req.get('/related?expand=dummy.a.b')).status_code, 400)
+
+
+class TestFilteringAndOrdering(TestResourcesBase):
+
+    def setUp(self):
+        super(TestFilteringAndOrdering, self).setUp()
+        self.dummies = [DummyModel.objects.create(name='dummy%s' % i) for i in range(3)]
+        for dummy in self.dummies + self.dummies[:1]:
+            DummyRelatedModel.objects.create(name='related', dummy=dummy)
+
+        class RelatedResource(ModelResource):
+            model = DummyRelatedModel
+            fields = ('id', 'dummy')
+            filter_fields = ('dummy', 'last_modified')
+            ordering_fields = ('dummy', 'last_modified')
+        self.view = PaginatedListOrCreateModelView.as_view(resource=RelatedResource, limit=10)
+
+    def _results(self, params):
+        response = self.view(self.req.get('/related', params))
+        self.assertEqual(response.status_code, 200)
+        return [(row['id'], row['dummy']['id']) for row in json.loads(response.content)['results']]
+
+    def test_list_must_be_filtered_by_query_parameters(self):
+        self.assertEqual(self._results({'dummy': self.dummies[0].id}), [(1, 1), (4, 1)])
+        self.assertEqual(self._results({'dummy__in': '2,3'}), [(2, 2), (3, 3)])
+        self.assertEqual(self._results({'dummy__gt': 1, 'page': 1}), [(2, 2), (3, 3)])
+
+    def test_ordering_must_break_ties_on_pk(self):
+        self.assertEqual(self._results({'ordering': '-dummy'}), [(3, 3), (2, 2), (1, 1), (4, 1)])
+
+    def test_blank_ordering_keys_must_be_ignored(self):
+        self.assertEqual(self._results({'ordering': '-dummy,'}), [(3, 3), (2, 2), (1, 1), (4, 1)])
+        self.assertEqual(self._results({'ordering': ' , '}), [(1, 1), (2, 2), (3, 3), (4, 1)])
+
+    def test_unknown_filters_and_ordering_must_return_400(self):
+        for params in ({'dummy__contains': 1}, {'dummy': 'one'}, {'ordering': 'name'}):
+            self.assertEqual(self.view(self.req.get('/related', params)).status_code, 400)
+
+    def test_unindexed_fields_must_be_reported(self):
+        class NameResource(ModelResource):
+            model = DummyModel
+            filter_fields = ('name',)
+
+        class StrictNameResource(NameResource):
+            require_index = True
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            NameResource.check_indexes()
+        self.assertEqual(len(caught), 1)
+        self.assertTrue('name' in str(caught[0].message))
+        self.assertRaises(ImproperlyConfigured, StrictNameResource.check_indexes)
@@ -0,0 +1,103 @@
+import threading
+
+from django.core.cache import cache
+from djangorestframework import status
+from djangorestframework.response import ErrorResponse
+from djangorestframework.tests.testcases import SettingsTestCase
+from serene.singleflight import CacheSingleFlight, SingleFlight
+
+
+class TestSingleFlight(SettingsTestCase):
+
+    def test_concurrent_calls_must_share_one_computation(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        computed = []
+        results = []
+
+        def compute():
+            computed.append(1)
+            started.set()
+            release.wait()
+            return 'result'
+
+        leader = threading.Thread(target=lambda: results.append(flight.do('key', compute)))
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=lambda: results.append(flight.do('key', compute))) for i in range(5)]
+        for follower in followers:
+            follower.start()
+        while flight.stats()['shared'] < 5:
+            pass
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(results, ['result'] * 6)
+        self.assertEqual(flight.stats(), {'calls': 6, 'shared': 5})
+        self.assertEqual(flight.flights, {})
+
+    def test_error_responses_must_be_shared_with_followers(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        statuses = []
+
+        def not_found():
+            started.set()
+            release.wait()
+            raise ErrorResponse(status.HTTP_404_NOT_FOUND)
+
+        def get():
+            try:
+                flight.do('key', not_found)
+            except ErrorResponse, exc:
+                statuses.append(exc.response.status)
+
+        leader = threading.Thread(target=get)
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=get) for i in range(3)]
+        for follower in followers:
+            follower.start()
+        while flight.stats()['shared'] < 3:
+            pass
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(statuses, [404] * 4)
+
+    def test_errors_must_be_shared_and_not_remembered(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError('failed')
+
+        self.assertRaises(ValueError, flight.do, 'key', fail)
+        self.assertEqual(flight.do('key', lambda: 'result'), 'result')
+
+
+class TestCacheSingleFlight(SettingsTestCase):
+
+    def tearDown(self):
+        cache.clear()
+        super(TestCacheSingleFlight, self).tearDown()
+
+    def test_result_of_another_process_must_be_shared(self):
+        flight = CacheSingleFlight()
+        # another process holds the lock and publishes its result
+        cache.add('serene:flight:key', 'other', 10)
+        cache.set('serene:flight:key:other', ('shared',), 10)
+
+        self.assertEqual(flight.do('key', lambda: 'computed'), 'shared')
+        self.assertEqual(flight.stats()['shared'], 1)
+
+    def test_must_compute_when_lock_holder_fails(self):
+        flight = CacheSingleFlight(wait=0.05)
+        cache.add('serene:flight:key', 'other', 10)
+
+        self.assertEqual(flight.do('key', lambda: 'computed'), 'computed')
+        cache.delete('serene:flight:key')
+        self.assertEqual(flight.do('key', lambda: 'again'), 'again')
+        self.assertEqual(cache.get('serene:flight:key'), None)
@@ -0,0 +1,149 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import simplejson as json
+from django.utils.encoding import smart_unicode
+from django.utils.http import parse_etags, parse_http_date_safe, quote_etag
+
+try:
+    from django.utils.timezone import now
+except ImportError:
+    # django < 1.4 only has naive local datetimes
+    now = datetime.now
+
+# serene sends `last_modified` as-is in the Last-Modified header,
+# so clients may echo back either of these, their ISO 8601 forms or a proper HTTP date
+DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S')
+
+
+def parse_datetime_header(value):
+    """
+    Parses the value of an If-Modified-Since like header into a (datetime, exact) tuple.
+    `exact` is False when the value only has a resolution of whole seconds (HTTP dates).
+    Returns (None, False) if the value can't be parsed.
+    """
+    value = value.strip()
+    for format in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, format), True
+        except ValueError:
+            pass
+
+    timestamp = parse_http_date_safe(value)
+    if timestamp is None:
+        return None, False
+    return datetime.fromtimestamp(timestamp), False
+
+
+def was_modified_since(last_modified, header):
+    """
+    Returns False if `last_modified` is not later than the date in `header`,
+    the value of an If-Modified-Since header, True otherwise
+    """
+    since, exact = parse_datetime_header(header)
+    if since is None:
+        return True
+    if not exact:
+        last_modified = last_modified.replace(microsecond=0)
+    return last_modified > since
+
+
+def row_etag(last_modified):
+    """
+    Builds the ETag of an instance from its `last_modified`,
+    so a precondition on it can be checked by the database
+    """
+    return quote_etag(last_modified.isoformat())
+
+
+def parse_row_etags(header):
+    """
+    Parses the ETags of an If-Match header made by `row_etag` back into
+    the `last_modified` values they stand for, skipping foreign ones
+    """
+    values = []
+    for etag in parse_etags(header):
+        value, exact = parse_datetime_header(etag)
+        if exact:
+            values.append(value)
+    return values
+
+
+def unmodified_since_lookup(header):
+    """
+    Turns the date of an If-Unmodified-Since header into a lookup on `last_modified`,
+    or returns None if it can't be parsed
+    """
+    since, exact = parse_datetime_header(header)
+    if since is None:
+        return None
+    if exact:
+        return {'last_modified__lte': since}
+    # HTTP dates drop the fraction of a second
+    return {'last_modified__lt': since + timedelta(seconds=1)}
+
+
+def encode_cursor(direction, values):
+    """
+    Encodes a keyset position into an opaque, url safe cursor.
+    `direction` is either 'next' or 'previous'.
+    """
+    values = [value if isinstance(value, (int, long)) else smart_unicode(value) for value in values]
+    return urlsafe_b64encode(json.dumps([direction] + values))
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor made by `encode_cursor` into a (direction, values) tuple.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        decoded = json.loads(urlsafe_b64decode(str(cursor)))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor %r' % cursor)
+    if not isinstance(decoded, list) or len(decoded) < 2 or decoded[0] not in ('next', 'previous'):
+        raise ValueError('Invalid cursor %r' % cursor)
+    return decoded[0], decoded[1:]
+
+
+def convert_position(model, names, values):
+    """
+    Converts the values of a decoded cursor to the types of the `names` fields of `model`.
+    Raises ValueError if there are too few or too many of them, or one isn't valid.
+    """
+    if len(values) != len(names):
+        raise ValueError('Expected %s cursor values, got %s' % (len(names), len(values)))
+    position = []
+    for name, value in zip(names, values):
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        try:
+            position.append(field.to_python(value))
+        except ValidationError:
+            raise ValueError('Invalid cursor value %r for %s' % (value, name))
+    return position
+
+
+def reverse_ordering(ordering):
+    """
+    Flips the direction of every key of an order_by() style ordering
+    """
+    return [key[1:] if key.startswith('-') else '-' + key for key in ordering]
+
+
+def seek_query(ordering, values):
+    """
+    Builds the Q object selecting rows strictly after `values` in `ordering`,
+    e.g. for ('last_modified', 'id'):
+    last_modified > v1 OR (last_modified = v1 AND id > v2)
+    """
+    query = None
+    equal = {}
+    for key, value in zip(ordering, values):
+        name = key.lstrip('-')
+        lookup = '%s__%s' % (name, 'lt' if key.startswith('-') else 'gt')
+        step = Q(**dict(equal, **{lookup: value}))
+        query = step if query is None else query | step
+        equal[name] = value
+    return query
@@ -1,16 +1,16 @@
-from djangorestframework.mixins import InstanceMixin, DeleteModelMixin, ListModelMixin
+from djangorestframework.mixins import InstanceMixin, DeleteModelMixin
 from djangorestframework.views import ModelView
-from serene.mixins import CreateModelMixin, ReadModelMixin, UpdateModelMixin, UpdateOrCreateModelMixin, PaginatorMixin
+from serene.mixins import CreateModelMixin, ReadModelMixin, UpdateModelMixin, UpdateOrCreateModelMixin, ListModelMixin, PaginatorMixin, TimingMixin, CompressionMixin
 
 
-class InstanceModelView(InstanceMixin, ReadModelMixin, UpdateModelMixin, DeleteModelMixin, ModelView):
+class InstanceModelView(TimingMixin, InstanceMixin, ReadModelMixin, UpdateModelMixin, DeleteModelMixin, ModelView):
     pass
 
-class CreatableInstanceModelView(InstanceMixin, ReadModelMixin, UpdateOrCreateModelMixin, DeleteModelMixin, ModelView):
+class CreatableInstanceModelView(TimingMixin, InstanceMixin, ReadModelMixin, UpdateOrCreateModelMixin, DeleteModelMixin, ModelView):
     pass
 
-class PaginatedListOrCreateModelView(ListModelMixin, CreateModelMixin, PaginatorMixin, ModelView):
+class PaginatedListOrCreateModelView(TimingMixin, CompressionMixin, ListModelMixin, CreateModelMixin, PaginatorMixin, ModelView):
     pass
 
-class ListOrCreateModelView(ListModelMixin, CreateModelMixin, ModelView):
+class ListOrCreateModelView(TimingMixin, CompressionMixin, ListModelMixin, CreateModelMixin, ModelView):
     pass
\ No newline at end of file
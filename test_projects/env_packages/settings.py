@@ -17,7 +17,13 @@ DATABASES = {
         'PASSWORD': '',                  # Not used with sqlite3.
         'HOST': '',                      # Set to empty string for localhost. Not used with sqlite3.
         'PORT': '',                      # Set to empty string for default. Not used with sqlite3.
-    }
+    },
+    # a read replica of default, for serene's replica routing
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'test.db',
+        'TEST_MIRROR': 'default',
+    },
 }
 
 # Local time zone for this installation. Choices can be found here: